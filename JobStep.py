@@ -1,8 +1,8 @@
 from datetime import datetime
-from SlurmTres import TRESData
+from SlurmTres import TRESData, TRESStore, StoredTRES, allocated_items, peak_memory, tres_count
 from SlurmTime import TimeInfo  # assuming job steps also include time-related data
 from dataclasses import dataclass
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Union
 from enum import Enum
 import json
 
@@ -68,13 +68,22 @@ class JobStep:
         return self.step.get("id", None)
 
     @classmethod
-    def from_json(cls, data: Dict[str, Any]):
+    def from_json(cls, data: Dict[str, Any], lazy: bool = False, keep_raw: bool = False, keep_tres: bool = True,
+                  tres_store: Optional[TRESStore] = None):
+        if lazy:
+            return LazyJobStep.from_json(data, keep_raw=keep_raw, keep_tres=keep_tres, tres_store=tres_store)
+
         time_data = data['time']
         time_info = TimeInfo.from_json(time_data) if any(
             k in time_data for k in ("start_time", "end_time", "elapsed")
         ) else None
 
-        tres_data = TRESData.from_json(data["tres"]) if "tres" in data else None
+        if "tres" not in data:
+            tres_data = None
+        elif tres_store is not None:
+            tres_data = tres_store.add(data["tres"])
+        else:
+            tres_data = TRESData.from_json(data["tres"])
 
         return cls(
             state=data.get("state", ""),
@@ -120,6 +129,102 @@ class JobStep:
         return "\n".join(parts)
 
 
+class LazyJobStep:
+    """
+    A JobStep that keeps only what the efficiency calculations read.
+
+    The id, name, state, elapsed and total CPU time, allocated CPUs and memory
+    and peak memory are pulled out of the step's dict when it is decoded.  The
+    time, tres and exit_code sub-dicts are kept undecoded and turned into
+    TimeInfo/TRESData/ExitCode the first time they are accessed; everything
+    else (CPU, statistics, reservation, script, nodes...) is dropped unless
+    keep_raw is given, in which case the whole dict is kept as `raw`.
+
+    The tres dict is most of a step's size, so when only the numbers above
+    are needed, keep_tres=False drops it too and `tres` is None.  With a
+    tres_store, the TRES go into the shared columnar store instead (see
+    SlurmTres.TRESStore) and `tres` is a StoredTRES view.
+    """
+
+    __slots__ = ('name', 'step_id', 'state', 'elapsed', 'cpu_seconds',
+                 'alloc_cpus', 'alloc_mem', 'max_mem',
+                 '_time', '_tres', '_exit_code', 'raw')
+
+    def __init__(self, name: Optional[str] = None, step_id: Optional[dict] = None, state: Optional[str] = None,
+                 elapsed: Optional[int] = None, cpu_seconds: float = 0.0, alloc_cpus: Optional[int] = None,
+                 alloc_mem: Optional[int] = None, max_mem: Optional[int] = None,
+                 time: Optional[dict] = None, tres: Optional[dict] = None, exit_code: Optional[dict] = None,
+                 raw: Optional[dict] = None):
+        self.name = name
+        self.step_id = step_id
+        self.state = state
+        self.elapsed = elapsed          # seconds
+        self.cpu_seconds = cpu_seconds  # user + system
+        self.alloc_cpus = alloc_cpus
+        self.alloc_mem = alloc_mem      # bytes
+        self.max_mem = max_mem          # bytes, peak over the step's tasks
+        # undecoded until first accessed
+        self._time = time
+        self._tres = tres
+        self._exit_code = exit_code
+        self.raw = raw
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any], keep_raw: bool = False, keep_tres: bool = True,
+                  tres_store: Optional[TRESStore] = None) -> "LazyJobStep":
+        step = data.get("step") or {}
+        time_data = data.get("time") or {}
+        tres_data = data.get("tres") or {}
+
+        total = time_data.get("total")
+        cpu_seconds = total.get("seconds", 0) + total.get("microseconds", 0) / 1_000_000 if total else 0.0
+
+        allocated = allocated_items(tres_data)
+        alloc_mem = tres_count(allocated, "mem")
+
+        tres = None
+        if keep_tres and tres_data:
+            tres = tres_store.add(tres_data) if tres_store is not None else tres_data
+
+        return cls(name=step.get("name"),
+                   step_id=step.get("id"),
+                   state=data.get("state", ""),
+                   elapsed=time_data.get("elapsed"),
+                   cpu_seconds=cpu_seconds,
+                   alloc_cpus=tres_count(allocated, "cpu"),
+                   alloc_mem=alloc_mem * 1024 ** 2 if alloc_mem is not None else None,  # MiB
+                   max_mem=peak_memory(tres_data),
+                   time=time_data,
+                   tres=tres,
+                   exit_code=data.get("exit_code"),
+                   raw=data if keep_raw else None)
+
+    @property
+    def time(self) -> Optional[TimeInfo]:
+        if isinstance(self._time, dict):
+            time_data = self._time
+            self._time = TimeInfo.from_json(time_data) if any(
+                k in time_data for k in ("start_time", "end_time", "elapsed")
+            ) else None
+        return self._time
+
+    @property
+    def tres(self) -> Optional[Union[TRESData, StoredTRES]]:
+        if isinstance(self._tres, dict):
+            self._tres = TRESData.from_json(self._tres) if self._tres else None
+        return self._tres
+
+    @property
+    def exit_code(self) -> Optional[ExitCode]:
+        if isinstance(self._exit_code, dict):
+            self._exit_code = ExitCode.from_json(self._exit_code)
+        return self._exit_code
+
+    def __repr__(self):
+        return (f"<LazyJobStep name={self.name!r}, state={self.state!r}, elapsed={self.elapsed}, "
+                f"cpu_seconds={self.cpu_seconds:.3f}, alloc_cpus={self.alloc_cpus}, max_mem={self.max_mem}>")
+
+
 if __name__ == "__main__":
 
     TEST_JSON = """
@@ -825,4 +930,5 @@ if __name__ == "__main__":
     for step_data in data['steps']:
         step = JobStep.from_json(step_data)
         print(step)
+        print(JobStep.from_json(step_data, lazy=True))
 
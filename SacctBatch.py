@@ -0,0 +1,194 @@
+"""
+NumPy batch engine for parse_sacct.py.
+
+Blocks of step groups are flattened into columnar arrays so that the
+`[D-]HH:MM:SS[.fff]` time strings and `NNN[KMGT]` memory strings are parsed
+with array operations, and the per-job aggregation and efficiencies are
+computed as array expressions.  The results are the same numbers that
+aggregate_sacct_rows() and calculate_efficiencies() produce one row at a time.
+"""
+import sys
+from itertools import islice
+from math import nan
+from typing import Any, Callable, Iterable, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+from SacctRecord import JobRecord
+
+# seconds in each ':' / '-' separated field, counted from the right
+_FIELD_SECONDS = np.array([1, 60, 3600, 86400], dtype=np.int64)
+
+_MEMORY_UNITS = {ord('K'): 1, ord('M'): 2, ord('G'): 3, ord('T'): 4}
+
+
+def _char_matrix(values: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Fixed-width byte array of the stripped strings and its (n, width) uint8 view."""
+    strings = np.array([(v or '').strip().upper() for v in values], dtype='S')
+    return strings, strings.view(np.uint8).reshape(len(strings), strings.dtype.itemsize)
+
+
+def parse_times(values: Sequence[str]) -> np.ndarray:
+    """Vectorized parse_time(): Slurm time strings to float seconds, 0.0 when missing or invalid."""
+    n = len(values)
+    if n == 0:
+        return np.zeros(0)
+
+    _, chars = _char_matrix(values)
+
+    digit = (chars >= ord('0')) & (chars <= ord('9'))
+    colon = chars == ord(':')
+    dash = chars == ord('-')
+    dot = chars == ord('.')
+
+    n_colons = colon.sum(axis=1)
+    n_dashes = dash.sum(axis=1)
+    valid = (np.all(digit | colon | dash | dot | (chars == 0), axis=1)
+             & (n_colons <= 2)
+             & (dot.sum(axis=1) <= 1)
+             & ((n_dashes == 0) | ((n_dashes == 1) & (n_colons == 2))))
+
+    # scan right to left accumulating the digits of the current field;
+    # the seconds field keeps its fraction and is divided once at the end
+    # so that it rounds exactly like float(sec)
+    acc = np.zeros(n, dtype=np.int64)
+    place = np.ones(n, dtype=np.int64)
+    fraction = np.ones(n, dtype=np.int64)
+    field = np.zeros(n, dtype=np.int64)
+    whole = np.zeros(n, dtype=np.int64)
+    seconds = np.zeros(n)
+
+    for j in range(chars.shape[1] - 1, -1, -1):
+        d = digit[:, j]
+        acc += np.where(d, (chars[:, j].astype(np.int64) - ord('0')) * place, 0)
+        place = np.where(d, place * 10, place)
+
+        is_dot = dot[:, j]
+        valid &= ~(is_dot & (field > 0))
+        fraction = np.where(is_dot, place, fraction)
+
+        sep = colon[:, j] | dash[:, j]
+        if not sep.any():
+            continue
+        seconds = np.where(sep & (field == 0), acc / fraction, seconds)
+        whole += np.where(sep & (field > 0), acc * _FIELD_SECONDS[np.minimum(field, 3)], 0)
+        field = np.where(dash[:, j], 3, np.where(colon[:, j], field + 1, field))
+        acc = np.where(sep, 0, acc)
+        place = np.where(sep, 1, place)
+
+    # close the leftmost field
+    seconds = np.where(field == 0, acc / fraction, seconds)
+    whole += np.where(field > 0, acc * _FIELD_SECONDS[np.minimum(field, 3)], 0)
+
+    return np.where(valid, whole + seconds, 0.0)
+
+
+def convert_to_bytes_array(values: Sequence[str]) -> np.ndarray:
+    """Vectorized convert_to_bytes(): '320K', '37.50G', '4096' etc. to int64 bytes."""
+    n = len(values)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    strings, chars = _char_matrix(values)
+    length = (chars != 0).sum(axis=1)
+    rows = np.arange(n)
+    last = chars[rows, np.maximum(length - 1, 0)]
+
+    power = np.zeros(n, dtype=np.int64)
+    for unit, exponent in _MEMORY_UNITS.items():
+        power[last == unit] = exponent
+
+    # blank out the unit suffix in place so the numeric part converts directly
+    has_unit = power > 0
+    chars[rows[has_unit], length[has_unit] - 1] = 0
+    strings[length == 0] = b'0'
+
+    number = strings.astype(np.float64)
+    return np.trunc(number * (1024.0 ** power)).astype(np.int64)
+
+
+def aggregate_block(groups: Sequence[Tuple[str, List[Any]]],
+                    summarize: Callable[[List[Any]], JobRecord]) -> List[JobRecord]:
+    """Vectorized aggregate_sacct_rows() over a block of (jid, steps) groups, `summarize` being its summarize_top_level()."""
+    records = []
+    owner = []
+    total_cpu = []
+    elapsed = []
+    max_rss = []
+
+    for g, (jid, steps) in enumerate(groups):
+        records.append(summarize(steps))
+        for step in steps[1:]:
+            owner.append(g)
+            total_cpu.append(step.TotalCPU)
+            elapsed.append(step.Elapsed)
+            max_rss.append(step.MaxRSS)
+
+    n_groups = len(groups)
+    owner = np.array(owner, dtype=np.intp)
+
+    total_cpu_sum = np.bincount(owner, weights=parse_times(total_cpu), minlength=n_groups)
+
+    elapsed_max = np.zeros(n_groups)
+    np.maximum.at(elapsed_max, owner, parse_times(elapsed))
+
+    max_rss_max = np.zeros(n_groups, dtype=np.int64)
+    np.maximum.at(max_rss_max, owner, convert_to_bytes_array(max_rss))
+
+    for record, cpu, wall, rss in zip(records,
+                                      total_cpu_sum.tolist(),
+                                      np.trunc(elapsed_max).tolist(),
+                                      max_rss_max.tolist()):
+        record.total_cpu = cpu
+        record.elapsed = wall
+        record.max_rss = rss
+
+    return records
+
+
+def calculate_efficiencies_block(records: Sequence[JobRecord]) -> List[JobRecord]:
+    """Vectorized calculate_efficiencies() over a block of aggregated jobs."""
+    requested_mem = np.array([record.req_mem for record in records], dtype=np.int64)
+    max_rss = np.array([record.max_rss for record in records], dtype=np.int64)
+    total_cpu = np.array([record.total_cpu for record in records], dtype=np.float64)
+    elapsed = np.array([record.elapsed for record in records], dtype=np.float64)
+    alloc_cpus = np.array([record.alloc_cpus for record in records], dtype=np.int64)
+
+    cpu_wall_time = elapsed * alloc_cpus
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        memory_efficiency = (max_rss / requested_mem) * 100
+        cpu_efficiency = (total_cpu / cpu_wall_time) * 100
+
+    zero_wall = (cpu_wall_time == 0) & (total_cpu != 0)
+    cpu_efficiency[zero_wall] = nan
+    for i in np.flatnonzero(zero_wall):
+        print(f"Warning 0 Elapsed time {records[i].JobID}", file=sys.stderr)
+
+    for record, wall, cpu_eff, mem_eff in zip(records,
+                                              cpu_wall_time.tolist(),
+                                              cpu_efficiency.tolist(),
+                                              memory_efficiency.tolist()):
+        record.cpu_wall_time = wall
+        record.cpu_efficiency = cpu_eff if record.total_cpu else 0
+        record.memory_efficiency = mem_eff if record.req_mem else 0
+
+    return list(records)
+
+
+def process_batches(groups: Iterable[Tuple[str, List[Any]]], batch_size: int,
+                    summarize: Callable[[List[Any]], JobRecord]) -> Iterator[JobRecord]:
+    """
+    Yield aggregated JobRecords with their efficiencies, converting `batch_size` jobs at a time.
+
+    `summarize` is parse_sacct.summarize_top_level(), passed in by the caller:
+    importing parse_sacct here would load a second copy of it when it runs as
+    a script.
+    """
+    groups = iter(groups)
+    while True:
+        block = list(islice(groups, batch_size))
+        if not block:
+            return
+
+        yield from calculate_efficiencies_block(aggregate_block(block, summarize))
@@ -0,0 +1,89 @@
+"""
+Persistent checkpoint for incremental parse_sacct.py runs.
+
+The checkpoint records the high-water marks of the End and Submit times of the
+jobs already reported, plus the JobIDs completed at or after the End mark
+(the only completed jobs a later `sacct -S <End mark>` can return again).
+Jobs that are still pending or running are not recorded, so they are
+reported again on every run until they finish.
+"""
+import json
+import os
+from typing import Dict, Optional
+
+# states in which a job can still change
+ACTIVE_STATES = ("PENDING", "RUNNING", "REQUEUED", "RESIZING", "SUSPENDED", "CONFIGURING", "COMPLETING")
+
+UNSET_TIMES = ("", "Unknown", "None")
+
+CHECKPOINT_VERSION = 1
+
+
+def is_complete(state: str, end: str) -> bool:
+    return end not in UNSET_TIMES and not state.startswith(ACTIVE_STATES)
+
+
+class Checkpoint:
+    def __init__(self, path: str,
+                 end_mark: Optional[str] = None,
+                 submit_mark: Optional[str] = None,
+                 completed: Optional[Dict[str, str]] = None):
+        self.path = path
+        self.end_mark = end_mark          # latest End of a completed job
+        self.submit_mark = submit_mark    # latest Submit of any job
+        self.completed = completed or {}  # job id prefix -> End, for jobs ending at or after end_mark
+        self.skipped = 0
+        # jobs are compared against the mark of the previous run, not the one
+        # this run is moving forward, since input is not ordered by End
+        self._previous_end_mark = end_mark
+
+    @classmethod
+    def load(cls, path: str) -> "Checkpoint":
+        if not os.path.exists(path):
+            return cls(path)
+
+        with open(path) as fh:
+            data = json.load(fh)
+        if data.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"{path}: unsupported checkpoint version {data.get('version')}")
+
+        return cls(path,
+                   end_mark=data.get("end"),
+                   submit_mark=data.get("submit"),
+                   completed=data.get("completed", {}))
+
+    def save(self):
+        # completed jobs that ended before the mark cannot be returned by the next fetch
+        if self.end_mark:
+            self.completed = {job_id: end for job_id, end in self.completed.items() if end >= self.end_mark}
+
+        data = {"version": CHECKPOINT_VERSION,
+                "end": self.end_mark,
+                "submit": self.submit_mark,
+                "completed": self.completed}
+
+        # write-and-rename so an interrupted run leaves the previous checkpoint intact
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as fh:
+            json.dump(data, fh)
+        os.replace(tmp_path, self.path)
+
+    def starttime(self) -> Optional[str]:
+        """sacct --starttime that returns every job not yet completed in a previous run."""
+        return self.end_mark or self.submit_mark
+
+    def is_done(self, job_id: str, state: str, end: str) -> bool:
+        if job_id in self.completed:
+            return True
+        return (self._previous_end_mark is not None
+                and is_complete(state, end)
+                and end < self._previous_end_mark)
+
+    def record(self, job_id: str, state: str, submit: str, end: str):
+        if submit not in UNSET_TIMES and (self.submit_mark is None or submit > self.submit_mark):
+            self.submit_mark = submit
+
+        if is_complete(state, end):
+            self.completed[job_id] = end
+            if self.end_mark is None or end > self.end_mark:
+                self.end_mark = end
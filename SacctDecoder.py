@@ -0,0 +1,285 @@
+from collections import namedtuple
+from functools import lru_cache
+from operator import itemgetter
+from typing import Dict, List, Optional, Sequence
+
+# columns that parse_sacct.py reads from every row, in the order of the
+# --format string used to produce the original 18 column dumps
+SACCT_FIELDS = ("JobID",
+                "User",
+                "Group",
+                "State",
+                "Cluster",
+                "AllocCPUS",
+                "REQMEM",
+                "TotalCPU",
+                "Elapsed",
+                "MaxRSS",
+                "ExitCode",
+                "NNodes",
+                "NTasks",
+                "JobName",
+                "Submit",
+                "Start",
+                "End",
+                "Account")
+
+DEFAULT_FORMAT = ",".join(SACCT_FIELDS)
+
+# low-cardinality columns whose values are shared through a per-column table,
+# so repeated values are one string object (with a cached hash for the
+# conversion caches) instead of a fresh copy per line
+INTERN_FIELDS = ("User",
+                 "Group",
+                 "State",
+                 "Cluster",
+                 "AllocCPUS",
+                 "REQMEM",
+                 "Elapsed",
+                 "ExitCode",
+                 "NNodes",
+                 "NTasks",
+                 "JobName",
+                 "Account",
+                 "Partition",
+                 "QOS")
+
+# a column stops growing its table after this many distinct values
+INTERN_TABLE_SIZE = 1 << 16
+
+# sacct accepts field names in any case and prints some of them differently
+# in the header than we spell them (e.g. ReqMem), so match case-insensitively
+_CANONICAL_NAMES = {name.lower(): name for name in SACCT_FIELDS}
+
+
+def parse_format(format_str: str) -> List[str]:
+    """Split a sacct --format string (or a -P header line) into column names."""
+    columns = []
+    for column in format_str.replace('|', ',').split(','):
+        # drop width specifiers like JobName%30
+        column = column.strip().split('%')[0]
+        if column:
+            columns.append(_CANONICAL_NAMES.get(column.lower(), column))
+    return columns
+
+
+def is_header(line: str) -> bool:
+    return line.startswith('JobID|') or line.rstrip() == 'JobID'
+
+
+def job_id_prefix(job_id: str) -> str:
+    """JobID without its .step suffix: the job that a step line belongs to."""
+    if job_id.find('.') > 0:
+        return job_id.split('.', 1)[0]
+    return job_id
+
+
+# REQMEM, Elapsed, TotalCPU etc. repeat heavily across a dump and are converted
+# more than once per job, so the converters below are memoized with bounded LRU
+# caches; they live here so that every module shares one set of caches
+CONVERSION_CACHE_SIZE = 1 << 16
+
+
+# Function to convert human-readable memory sizes (e.g., '320K', '4G') to bytes
+@lru_cache(maxsize=CONVERSION_CACHE_SIZE)
+def convert_to_bytes(mem_str: str) -> int:
+
+    if mem_str == '': return 0
+
+    mem_str = mem_str.strip().upper()
+    if mem_str.endswith('K'):
+        return int(float(mem_str[:-1]) * 1024)
+    elif mem_str.endswith('M'):
+        return int(float(mem_str[:-1]) * 1024 ** 2)
+    elif mem_str.endswith('G'):
+        return int(float(mem_str[:-1]) * 1024 ** 3)
+    elif mem_str.endswith('T'):
+        return int(float(mem_str[:-1]) * 1024 ** 4)
+    else:
+        # Assume it's already in bytes if there's no suffix
+        return int(float(mem_str))
+
+
+def seconds_to_timeformat(seconds: float) -> str:
+    # Elapsed/TotalCPU arrive as floats that rarely repeat exactly, but only
+    # whole seconds are printed, so the cache is keyed on the truncated value
+    return _timeformat(int(seconds))
+
+
+@lru_cache(maxsize=CONVERSION_CACHE_SIZE)
+def _timeformat(seconds: int) -> str:
+    days = int(seconds/(3600*24))
+    seconds_remaining = seconds % (3600*24)
+    hours = int(seconds_remaining/3600)
+    seconds_remaining = seconds_remaining % 3600
+    minutes = int(seconds_remaining/60)
+    seconds = int(seconds_remaining % 60)
+
+    day_str = ''
+    if days > 0: day_str = f"{days}-"
+    return f"{day_str}{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+@lru_cache(maxsize=CONVERSION_CACHE_SIZE)
+def parse_time(s: Optional[str]) -> float:
+    """
+    Parse Slurm-style time strings into seconds.
+    Returns 0.0 if input is missing or invalid.
+    """
+    if not s or s.strip() in {"", "Unknown"}:
+        return 0.0
+
+    try:
+        parts = s.strip().split(":")
+        if len(parts) == 3:
+            hh, m, sec = parts
+            if hh.find('-') > 0:
+                days,hours = hh.split('-')
+                h = int(days) * 24 + int(hours)
+            else:
+                h = int(hh)
+            return h * 3600 + int(m) * 60 + float(sec)
+        elif len(parts) == 2:
+            m, sec = parts
+            return int(m) * 60 + float(sec)
+        elif len(parts) == 1:
+            return float(parts[0])
+    except (ValueError, TypeError):
+        return 0.0
+    
+    return 0
+
+
+def conversion_cache_stats() -> Dict[str, Dict[str, float]]:
+    stats = {}
+    for name, converter in (('convert_to_bytes', convert_to_bytes),
+                            ('parse_time', parse_time),
+                            ('seconds_to_timeformat', _timeformat)):
+        info = converter.cache_info()
+        lookups = info.hits + info.misses
+        stats[name] = {'hits': info.hits,
+                       'misses': info.misses,
+                       'size': info.currsize,
+                       'hit_rate': info.hits / lookups if lookups else 0.0}
+    return stats
+
+
+def clear_conversion_caches():
+    for converter in (convert_to_bytes, parse_time, _timeformat):
+        converter.cache_clear()
+
+
+class SacctDecoder:
+    """
+    Decode `sacct -P` lines into SacctRow namedtuples.
+
+    The column list is read once, from --format or from a header line, and
+    compiled into a single itemgetter that places every column of SACCT_FIELDS
+    (empty string when the column is absent) followed by any extra columns.
+    """
+
+    def __init__(self, columns: Sequence[str], intern_fields: Sequence[str] = INTERN_FIELDS):
+        self.intern_fields = tuple(intern_fields)
+        self.lines_decoded = 0
+        self.intern_overflow = 0
+        self._tables = {}
+        # per interned column: lookups of the column plans before the current
+        # one, and values left uninterned because the table was full
+        self._intern_lookups: Dict[str, int] = {}
+        self._intern_missed: Dict[str, int] = {}
+        self._plan_start = 0
+        self._intern_plan = []
+        self.set_columns(columns)
+
+    @classmethod
+    def from_format(cls, format_str: str = DEFAULT_FORMAT, intern_fields: Sequence[str] = INTERN_FIELDS) -> "SacctDecoder":
+        return cls(parse_format(format_str), intern_fields)
+
+    def set_columns(self, columns: Sequence[str]):
+        columns = list(columns)
+        if 'JobID' not in columns:
+            raise ValueError(f"sacct format must include JobID: {','.join(columns)}")
+
+        for column in columns:
+            if not column.isidentifier():
+                raise ValueError(f"unsupported sacct column name: {column!r}")
+
+        self.columns = columns
+        self.extra_fields = tuple(c for c in columns if c not in SACCT_FIELDS)
+        self.row_type = namedtuple('SacctRow', SACCT_FIELDS + self.extra_fields)
+
+        # extraction plan: input position of each output field, -1 picks the
+        # empty string appended to every split line
+        position = {column: i for i, column in enumerate(columns)}
+        plan = [position.get(field, -1) for field in self.row_type._fields]
+
+        self._width = len(columns)
+        self._job_id_index = position['JobID']
+        self._make = self.row_type._make
+        self._empty_row = self._make(('',) * len(self.row_type._fields))
+        if plan == list(range(self._width)):
+            self._pick = None
+        else:
+            self._pick = itemgetter(*plan)
+
+        # tables survive a change of columns (e.g. repeated headers in concatenated dumps)
+        self._count_plan_lookups()
+        self._intern_plan = [(position[field], self._tables.setdefault(field, {}), field)
+                             for field in self.intern_fields if field in position]
+
+    def decode(self, line: str):
+        fields = line.rstrip('\r\n').split('|')
+        if len(fields) < self._width:
+            if fields == ['']:
+                # a blank line is an empty row, not a lookup of the interned columns
+                return self._empty_row
+            fields.extend([''] * (self._width - len(fields)))
+
+        self.lines_decoded += 1
+        for i, table, field in self._intern_plan:
+            value = fields[i]
+            shared = table.get(value)
+            if shared is not None:
+                fields[i] = shared
+            elif len(table) < INTERN_TABLE_SIZE:
+                table[value] = value
+            else:
+                self.intern_overflow += 1
+                self._intern_missed[field] = self._intern_missed.get(field, 0) + 1
+
+        if self._pick is None:
+            if len(fields) > self._width:
+                del fields[self._width:]
+            return self._make(fields)
+
+        fields.append('')
+        return self._make(self._pick(fields))
+
+    def job_id_prefix(self, line: str) -> str:
+        """JobID of a raw line without its .step suffix, without decoding the whole line."""
+        if self._job_id_index == 0:
+            job_id = line.partition('|')[0]
+        else:
+            job_id = line.split('|', self._job_id_index + 1)[self._job_id_index]
+        return job_id_prefix(job_id.rstrip('\r\n'))
+
+    def _count_plan_lookups(self):
+        # every line decoded since the plan was set looked up each of its columns
+        for _, _, field in self._intern_plan:
+            self._intern_lookups[field] = self._intern_lookups.get(field, 0) + self.lines_decoded - self._plan_start
+        self._plan_start = self.lines_decoded
+
+    def intern_stats(self) -> Dict[str, Dict[str, float]]:
+        """Distinct values and hit rate of each interned column."""
+        self._count_plan_lookups()
+        stats = {}
+        for field, table in self._tables.items():
+            lookups = self._intern_lookups.get(field, 0)
+            # a value is a miss when it entered the table or found the table full
+            misses = len(table) + self._intern_missed.get(field, 0)
+            stats[field] = {'distinct': len(table),
+                            'lookups': lookups,
+                            'hit_rate': (lookups - misses) / lookups if lookups else 0.0}
+        if self.intern_overflow:
+            stats['overflow'] = {'lookups': self.intern_overflow}
+        return stats
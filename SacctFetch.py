@@ -0,0 +1,186 @@
+"""
+Time-sharded, concurrent sacct fetching.
+
+A --starttime/--endtime range is cut into day or week shards and one
+`sacct -P -n -S ... -E ...` subprocess is run per shard, several at a time.
+Complete job groups are streamed to the parser as each shard produces them.
+"""
+import queue
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from SacctDecoder import job_id_prefix
+
+SHARD_SIZES = {
+    'day': timedelta(days=1),
+    'week': timedelta(weeks=1),
+}
+
+SACCT_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+# complete job groups buffered between the sacct readers and the parser
+QUEUE_GROUPS = 4096
+
+
+def sacct_command(sacct_format: str, args: Sequence[str] = (), sacct: str = 'sacct') -> List[str]:
+    return [sacct, '-P', '-n', '--format', sacct_format, *args]
+
+
+def parse_sacct_time(value: str) -> datetime:
+    """Parse the YYYY-MM-DD[THH:MM[:SS]] forms accepted by sacct -S/-E."""
+    for fmt in (SACCT_TIME_FORMAT, "%Y-%m-%dT%H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    raise ValueError(f"unrecognized time {value!r}, expected YYYY-MM-DD[THH:MM[:SS]]")
+
+
+def shard_range(start: datetime, end: datetime, shard: str = 'day') -> List[Tuple[str, str]]:
+    """(starttime, endtime) strings covering [start, end) in `shard` sized steps."""
+    step = SHARD_SIZES[shard]
+    shards = []
+    shard_start = start
+    while shard_start < end:
+        shard_end = min(shard_start + step, end)
+        shards.append((shard_start.strftime(SACCT_TIME_FORMAT), shard_end.strftime(SACCT_TIME_FORMAT)))
+        shard_start = shard_end
+    return shards
+
+
+class _Stopped(Exception):
+    pass
+
+
+def _put(groups: queue.Queue, stop: threading.Event, item):
+    """Put `item` on `groups`, giving up with _Stopped once the consumer has stopped."""
+    while True:
+        if stop.is_set():
+            raise _Stopped()
+        try:
+            groups.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            pass
+
+
+def _fetch_shard(cmd: List[str], shard: int, groups: queue.Queue, stop: threading.Event):
+    """Run one sacct shard, putting (shard, prefix, lines) for each complete job group on `groups`."""
+    # stderr goes to a file so a chatty sacct cannot block on a full pipe while we read stdout
+    stderr = tempfile.TemporaryFile(mode='w+')
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr, text=True)
+    try:
+        prefix = None
+        lines = []
+        for line in proc.stdout:
+            if not line.strip():
+                continue
+            line_prefix = job_id_prefix(line.partition('|')[0])
+            if prefix is not None and line_prefix != prefix:
+                _put(groups, stop, (shard, prefix, lines))
+                lines = []
+            prefix = line_prefix
+            lines.append(line)
+        if lines:
+            _put(groups, stop, (shard, prefix, lines))
+
+        if proc.wait() != 0:
+            stderr.seek(0)
+            raise RuntimeError(f"{' '.join(cmd)} exited with {proc.returncode}: {stderr.read().strip()}")
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+        stderr.close()
+
+
+def fetch_sharded_lines(sacct_format: str,
+                        starttime: str,
+                        endtime: Optional[str] = None,
+                        shard: str = 'day',
+                        max_procs: int = 4,
+                        sacct_args: Sequence[str] = ('-a',),
+                        sacct: str = 'sacct') -> Iterator[str]:
+    """
+    Yield `sacct -P -n` lines for [starttime, endtime) fetched shard by shard.
+
+    Up to `max_procs` sacct processes run concurrently and their job groups are
+    interleaved as they arrive, so the output is grouped by job but not sorted.
+    A job that was active in several shards is reported by each of them; only
+    its first report is yielded.
+    """
+    start = parse_sacct_time(starttime)
+    end = parse_sacct_time(endtime) if endtime else datetime.now().replace(microsecond=0)
+
+    commands = [sacct_command(sacct_format, [*sacct_args, '-S', shard_start, '-E', shard_end], sacct)
+                for shard_start, shard_end in shard_range(start, end, shard)]
+    if not commands:
+        return
+
+    groups = queue.Queue(maxsize=QUEUE_GROUPS)
+    stop = threading.Event()
+    done = object()
+
+    def run(shard, cmd):
+        if stop.is_set():
+            return
+        try:
+            try:
+                _fetch_shard(cmd, shard, groups, stop)
+            except _Stopped:
+                return
+            except BaseException as e:
+                # hand the failure to the consumer; it stops the remaining shards
+                _put(groups, stop, (shard, done, e))
+                return
+            _put(groups, stop, (shard, done, None))
+        except _Stopped:
+            # the consumer is gone, nobody reads the queue any more
+            return
+
+    # A job is reported by every shard it was active in, a run of consecutive
+    # shards.  Once all shards before `low` are finished, a later report of a
+    # job from an earlier shard can only come from shard `low` or after, and
+    # such a job was also reported by shard low - 1, so the prefixes of the
+    # shards before that are forgotten.
+    seen = {}  # prefix -> latest shard that reported it
+    shard_prefixes = {}  # shard -> prefixes it reported
+    finished = set()
+    low = 0
+
+    pool = ThreadPoolExecutor(max_workers=max_procs)
+    for shard, cmd in enumerate(commands):
+        pool.submit(run, shard, cmd)
+
+    try:
+        remaining = len(commands)
+        while remaining:
+            shard, prefix, lines = groups.get()
+            if prefix is done:
+                remaining -= 1
+                if lines is not None:
+                    raise lines
+                finished.add(shard)
+                while low in finished:
+                    finished.discard(low)
+                    low += 1
+                    for forgotten in shard_prefixes.pop(low - 2, ()):
+                        if seen.get(forgotten) == low - 2:
+                            del seen[forgotten]
+                continue
+
+            shard_prefixes.setdefault(shard, []).append(prefix)
+            latest = seen.get(prefix)
+            seen[prefix] = shard if latest is None else max(latest, shard)
+            if latest is not None:
+                continue
+            yield from lines
+    finally:
+        # running shards notice `stop` on their next put and kill their sacct
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,276 @@
+"""
+Job filters for parse_sacct.py, evaluated on the sacct rows of a job.
+
+A filter is a list of expressions that must all hold:
+
+    State != FAILED          exact match; State compares its first word,
+                             so CANCELLED matches 'CANCELLED by 1234'
+    JobName ~ jupyter        regular expression search, !~ to exclude
+    Elapsed > 0              Elapsed/TotalCPU compare as seconds and accept
+                             [D-]HH:MM:SS, MaxRSS/REQMEM as bytes and accept
+                             320K, 4G..., AllocCPUS/NNodes/NTasks as integers
+    Submit >= 2024-03-01     Submit/Start/End compare as times; an Unknown
+                             time fails every comparison
+    TIMEOUT                  a bare word drops jobs whose State or any JobName
+                             is that word, like the lines of sacct_filters.txt;
+                             short for State != TIMEOUT and JobName != TIMEOUT
+    Elapsed > 0 or MaxRSS > 0 or TotalCPU > 0
+                             holds when any of its alternatives holds
+
+Most fields are read from the first row of a job's step group, the top-level
+row in sacct's output, so a job it rejects is dropped before its steps are
+decoded, aggregated or formatted.  The fields that parse_sacct.py aggregates
+over the steps are read from the whole group instead, as the output has them:
+
+    MaxRSS                   the largest MaxRSS of the steps
+    TotalCPU                 the sum of the steps' TotalCPU
+    JobName                  any name of the job and its steps (JobNames) for
+                             ~ and ==, none of them for !~ and !=
+
+A job rejected by those is still dropped before it is aggregated.
+"""
+import calendar
+import re
+from operator import eq, ge, gt, le, lt, ne
+from typing import Callable, Iterable, List, Optional, Sequence
+
+from SacctDecoder import convert_to_bytes, parse_time
+from SlurmTime import parse_sacct_timestamp
+
+# longest operators first so that '>=' is not read as '>'
+_EXPRESSION = re.compile(r'^\s*(\w+)\s*(!~|==|!=|>=|<=|>|<|~|=)\s*(.*?)\s*$')
+_BARE_WORD = re.compile(r'^[\w.+-]+$')
+_DURATION = re.compile(r'^(\d+-)?[\d:]*\d(\.\d+)?$')
+
+_COMPARISONS = {'==': eq, '=': eq, '!=': ne, '>': gt, '>=': ge, '<': lt, '<=': le}
+
+DURATION_FIELDS = ('Elapsed', 'TotalCPU')
+SIZE_FIELDS = ('MaxRSS', 'REQMEM')
+INTEGER_FIELDS = ('AllocCPUS', 'NNodes', 'NTasks')
+TIME_FIELDS = ('Submit', 'Start', 'End')
+# read from the whole step group rather than the top-level row
+GROUP_FIELDS = ('MaxRSS', 'TotalCPU', 'JobName')
+
+_ANY_OF = re.compile(r'\s+or\s+')
+
+
+class FilterError(ValueError):
+    pass
+
+
+def _converter(field: str) -> Optional[Callable[[str], Optional[float]]]:
+    """Numeric conversion of the raw values of `field`, None for string fields."""
+    if field in DURATION_FIELDS:
+        return parse_time
+    if field in SIZE_FIELDS:
+        return lambda value: convert_to_bytes(value) if value else 0
+    if field in INTEGER_FIELDS:
+        return lambda value: int(value) if value.isdigit() else None
+    if field in TIME_FIELDS:
+        return parse_sacct_timestamp
+    return None
+
+
+def _time_operand(value: str) -> int:
+    # filters may give just a date
+    from SacctFetch import parse_sacct_time
+    return calendar.timegm(parse_sacct_time(value).timetuple())
+
+
+def _state(value: str) -> str:
+    return value.split(' ', 1)[0]
+
+
+class Expression:
+    """One `field op value` comparison, or a bare word."""
+
+    def __init__(self, text: str):
+        self.text = text.strip()
+        match = _EXPRESSION.match(self.text)
+        if match:
+            self.field, self.op, self.value = match.groups()
+        elif _BARE_WORD.match(self.text):
+            self.field, self.op, self.value = None, None, self.text
+        else:
+            raise FilterError(f"cannot parse filter {self.text!r}, expected FIELD OP VALUE or a single word")
+
+    @property
+    def group(self) -> bool:
+        """True when the expression needs the whole step group."""
+        # a bare word also checks the step names
+        return self.field is None or self.field in GROUP_FIELDS
+
+    def compile(self, fields: Sequence[str]) -> Callable:
+        """Predicate over rows with the namedtuple `fields`."""
+        if self.field is None:
+            word = self.value
+            return lambda row: _state(row.State) != word and row.JobName != word
+
+        index = self._index(fields)
+        test = self._test()
+        return lambda row: test(row[index])
+
+    def compile_group(self, fields: Sequence[str]) -> Callable:
+        """Predicate over the rows of a step group, top-level row first."""
+        if not self.group:
+            predicate = self.compile(fields)
+            return lambda rows: predicate(rows[0])
+
+        if self.field is None:
+            word = self.value
+            # as 'State != word' and 'JobName != word'
+            return lambda rows: _state(rows[0].State) != word and word not in _job_names(rows)
+
+        self._index(fields)
+        if self.field == 'JobName':
+            test = self._test()
+            # a negated match has to hold for every name
+            combine = all if self.op in ('!=', '!~') else any
+            return lambda rows: combine(test(name) for name in _job_names(rows))
+
+        if self.op in ('~', '!~'):
+            raise FilterError(f"filter {self.text!r}: {self.field} is compared as a number, use == != > >= < <=")
+        compare = _COMPARISONS[self.op]
+        value = self._operand(_converter(self.field))
+        aggregate = _max_rss if self.field == 'MaxRSS' else _total_cpu
+        return lambda rows: compare(aggregate(rows), value)
+
+    def _index(self, fields: Sequence[str]) -> int:
+        if self.field not in fields:
+            raise FilterError(f"filter {self.text!r}: unknown field {self.field!r}, expected one of {', '.join(fields)}")
+        return list(fields).index(self.field)
+
+    def _test(self) -> Callable[[str], bool]:
+        """Predicate over one raw value of the field."""
+        if self.op in ('~', '!~'):
+            try:
+                search = re.compile(self.value).search
+            except re.error as e:
+                raise FilterError(f"filter {self.text!r}: {e}") from None
+            if self.op == '~':
+                return lambda value: search(value) is not None
+            return lambda value: search(value) is None
+
+        compare = _COMPARISONS[self.op]
+        convert = _converter(self.field)
+        if convert is None:
+            operand = self.value
+            if self.field == 'State':
+                return lambda value: compare(_state(value), operand)
+            return lambda value: compare(value, operand)
+
+        operand = self._operand(convert)
+
+        def test(value):
+            converted = convert(value)
+            return converted is not None and compare(converted, operand)
+        return test
+
+    def _operand(self, convert: Callable[[str], Optional[float]]):
+        """The value to compare numeric fields with."""
+        if self.field in DURATION_FIELDS and not _DURATION.match(self.value):
+            # parse_time() reads anything else as 0
+            raise FilterError(f"filter {self.text!r}: {self.value!r} is not a [D-]HH:MM:SS time or seconds")
+        try:
+            value = _time_operand(self.value) if self.field in TIME_FIELDS else convert(self.value)
+        except ValueError as e:
+            raise FilterError(f"filter {self.text!r}: {e}") from None
+        if value is None:
+            raise FilterError(f"filter {self.text!r}: {self.value!r} is not a valid {self.field} value")
+        return value
+
+
+class AnyOf:
+    """Expressions joined by `or`, holding when one of them does."""
+
+    def __init__(self, text: str):
+        self.text = text.strip()
+        self.expressions = [Expression(part) for part in _ANY_OF.split(self.text)]
+
+    @property
+    def group(self) -> bool:
+        return any(expression.group for expression in self.expressions)
+
+    def compile(self, fields: Sequence[str]) -> Callable:
+        predicates = [expression.compile(fields) for expression in self.expressions]
+        return lambda row: any(predicate(row) for predicate in predicates)
+
+    def compile_group(self, fields: Sequence[str]) -> Callable:
+        predicates = [expression.compile_group(fields) for expression in self.expressions]
+        return lambda rows: any(predicate(rows) for predicate in predicates)
+
+
+def parse_expressions(text: str) -> list:
+    """The Expressions of one filter line, or an AnyOf for alternatives joined by `or`."""
+    text = text.strip()
+    if _ANY_OF.search(text):
+        return [AnyOf(text)]
+    expression = Expression(text)
+    if expression.field is None:
+        # a bare word means 'State != word' and 'JobName != word'; split up,
+        # the State half can still reject a job by its top-level row
+        return [Expression(f"State != {text}"), Expression(f"JobName != {text}")]
+    return [expression]
+
+
+# the aggregates of parse_sacct.aggregate_sacct_rows(), over the steps after the top-level row
+def _max_rss(rows) -> int:
+    return max((convert_to_bytes(row.MaxRSS) for row in rows[1:] if row.MaxRSS), default=0)
+
+
+def _total_cpu(rows) -> float:
+    return sum(parse_time(row.TotalCPU) for row in rows[1:] if row.TotalCPU)
+
+
+def _job_names(rows) -> List[str]:
+    # the names of JobNames, or the one empty name of a job without any
+    return [row.JobName for row in rows if row.JobName] or ['']
+
+
+class RowFilter:
+    """
+    All of a list of expressions, bound to the current sacct columns.
+
+    bind() gives the predicate over the top-level row and bind_group() the one
+    over a whole step group for the expressions that need it, each None when
+    there is nothing for it to check.
+    """
+
+    def __init__(self, expressions: Iterable[str]):
+        self._texts = list(expressions)
+        self.expressions = [expression for text in self._texts for expression in parse_expressions(text)]
+        self.rejected = 0
+
+    @classmethod
+    def from_args(cls, expressions: Sequence[str] = (), files: Sequence[str] = ()) -> Optional["RowFilter"]:
+        """Filter from --filter expressions and --filter-file files, None when there are none."""
+        texts = list(expressions)
+        for path in files:
+            texts += read_filter_file(path)
+        return cls(texts) if texts else None
+
+    def texts(self) -> List[str]:
+        # picklable form for worker processes
+        return list(self._texts)
+
+    def bind(self, fields: Sequence[str]) -> Optional[Callable]:
+        """Predicate that is True for top-level rows to keep."""
+        return _all([expression.compile(list(fields)) for expression in self.expressions if not expression.group])
+
+    def bind_group(self, fields: Sequence[str]) -> Optional[Callable]:
+        """Predicate that is True for step groups to keep."""
+        return _all([expression.compile_group(list(fields)) for expression in self.expressions if expression.group])
+
+
+def _all(predicates: List[Callable]) -> Optional[Callable]:
+    if not predicates:
+        return None
+    if len(predicates) == 1:
+        return predicates[0]
+    return lambda value: all(predicate(value) for predicate in predicates)
+
+
+def read_filter_file(path: str) -> List[str]:
+    """One expression or bare word per line; blank lines and # comments are ignored."""
+    with open(path) as fh:
+        return [line.split('#', 1)[0].strip() for line in fh if line.split('#', 1)[0].strip()]
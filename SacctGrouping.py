@@ -0,0 +1,116 @@
+"""
+Hash grouping of `sacct -P` lines whose job steps are not contiguous.
+
+parse_sacct_lines() starts a new group whenever the JobID prefix changes,
+which splits a job into several rows when dumps are concatenated or fetched in
+parallel.  group_unsorted_lines() instead collects the lines of every job
+prefix until the end of the input.  When the buffered lines exceed a memory
+budget they are spilled to hash partitions on disk, which are then grouped
+one at a time.
+"""
+import hashlib
+import tempfile
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from SacctDecoder import SacctDecoder, is_header, parse_format
+from SacctFilter import RowFilter
+
+# hash partitions created by each spill
+SPILL_PARTITIONS = 64
+
+# a partition that is still over budget is partitioned again with a new
+# hash seed, but a single huge job cannot be split, so stop at some depth
+MAX_SPILL_DEPTH = 3
+
+
+def _partition(prefix: str, depth: int) -> int:
+    """Spill partition of a job prefix at a spill depth."""
+    # CRC32 is linear, so reseeding it only XORs a constant into the hashes of
+    # equal-length prefixes and a partition would never split at the next
+    # depth; a salted BLAKE2 hash is independent for every depth
+    digest = hashlib.blake2b(prefix.encode(), digest_size=4, salt=depth.to_bytes(2, 'little')).digest()
+    return int.from_bytes(digest, 'little') % SPILL_PARTITIONS
+
+
+def _decode_group(lines: List[str], decoder: SacctDecoder) -> list:
+    rows = [decoder.decode(line) for line in lines]
+    # aggregate_sacct_rows() expects the top-level row first; the sort is stable
+    # so the steps keep their input order
+    rows.sort(key=lambda row: '.' in row.JobID)
+    return rows
+
+
+def group_unsorted_lines(lines: Iterable[str],
+                         decoder: Optional[SacctDecoder] = None,
+                         memory_budget: int = 512 * 1024 * 1024,
+                         spill_dir: Optional[str] = None,
+                         row_filter: Optional[RowFilter] = None,
+                         _depth: int = 0) -> Iterator[Tuple[str, list]]:
+    """
+    Yield (job id prefix, rows) for every job in `lines`, wherever its steps appear.
+
+    At most `memory_budget` characters of raw lines are held in memory; beyond
+    that all lines go to SPILL_PARTITIONS temporary files in `spill_dir`.
+    Groups come out in order of first appearance within each partition, not
+    in input order.  Jobs that fail `row_filter`, on their top-level row or their
+    whole step group, are dropped before they are aggregated.
+    """
+    if decoder is None:
+        decoder = SacctDecoder.from_format()
+
+    groups: Dict[str, List[str]] = {}
+    buffered = 0
+    partitions = None
+
+    for line in lines:
+        if is_header(line):
+            columns = parse_format(line)
+            if columns != decoder.columns:
+                if groups or partitions:
+                    raise ValueError("unsorted grouping needs the same columns throughout the input")
+                decoder.set_columns(columns)
+            continue
+        if not line.strip():
+            continue
+
+        prefix = decoder.job_id_prefix(line)
+
+        if partitions is not None:
+            partitions[_partition(prefix, _depth)].write(line)
+            continue
+
+        group = groups.get(prefix)
+        if group is None:
+            groups[prefix] = group = []
+        group.append(line)
+        buffered += len(line)
+
+        if buffered > memory_budget and _depth < MAX_SPILL_DEPTH:
+            partitions = [tempfile.TemporaryFile('w+', dir=spill_dir) for _ in range(SPILL_PARTITIONS)]
+            for spilled_prefix, spilled_lines in groups.items():
+                partitions[_partition(spilled_prefix, _depth)].writelines(spilled_lines)
+            groups = {}
+            buffered = 0
+
+    if partitions is None:
+        keep = row_filter.bind(decoder.row_type._fields) if row_filter else None
+        keep_group = row_filter.bind_group(decoder.row_type._fields) if row_filter else None
+        for prefix, group in groups.items():
+            rows = _decode_group(group, decoder)
+            if keep is not None and not keep(rows[0]):
+                row_filter.rejected += 1
+                continue
+            if keep_group is not None and not keep_group(rows):
+                row_filter.rejected += 1
+                continue
+            yield prefix, rows
+        return
+
+    try:
+        for partition in partitions:
+            partition.seek(0)
+            yield from group_unsorted_lines(partition, decoder, memory_budget, spill_dir, row_filter, _depth + 1)
+            partition.close()
+    finally:
+        for partition in partitions:
+            partition.close()
@@ -0,0 +1,209 @@
+"""
+Incremental reader for `sacct --json` output.
+
+sacct writes one object with a small `meta` member and a `jobs` array that
+holds nearly all of the data.  The reader walks that array with
+json.JSONDecoder.raw_decode over a sliding text buffer, so only the job being
+decoded is held in memory instead of the whole document:
+
+    with open("sacct.json") as fh:
+        reader = SacctJsonReader(fh)
+        print(reader.meta["command"])
+        for job in reader:          # SlurmJob instances
+            ...
+
+The members before `jobs` (meta in sacct's output) are read when the reader
+is created; members after it (warnings, errors) once the jobs have been read.
+
+Run as a script, it converts a document to JSON Lines, one job per line,
+which seff.py --workers can split into byte ranges:
+
+    ./SacctJson.py sacct.json -o jobs.jsonl
+"""
+import argparse
+import json
+import re
+import sys
+from typing import Any, Dict, IO, Iterable, Iterator, Optional
+
+from SlurmJob import SlurmJob
+from SlurmTres import TRESStore
+
+# characters read from the file at a time; a job larger than this is read in
+# growing chunks until it decodes
+CHUNK_SIZE = 1 << 20
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_NUMBER_CHARS = re.compile(r'[-+0-9.eE]*')
+
+
+class SacctJsonReader:
+    """The jobs of a `sacct --json` document, one at a time."""
+
+    def __init__(self, fh: IO[str], chunk_size: int = CHUNK_SIZE, lazy: bool = False, keep_tres: bool = True,
+                 tres_store: Optional[TRESStore] = None):
+        self._fh = fh
+        # SlurmJob.from_json() options
+        self.lazy = lazy
+        self.keep_tres = keep_tres
+        self.tres_store = tres_store
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+        self._consumed = False
+        # top-level members other than jobs
+        self.members: Dict[str, Any] = {}
+        self.jobs_read = 0
+
+        self._expect('{')
+        self._has_jobs = self._read_members()
+
+    @property
+    def meta(self) -> Optional[Dict[str, Any]]:
+        return self.members.get('meta')
+
+    def job_dicts(self) -> Iterator[Dict[str, Any]]:
+        """The raw dicts of the jobs array, each one released once the next is read."""
+        if self._consumed:
+            raise RuntimeError("the jobs of a sacct --json document can only be read once")
+        self._consumed = True
+
+        if self._has_jobs:
+            self._expect('[')
+            if self._peek() == ']':
+                self._pos += 1
+            else:
+                while True:
+                    yield self._value()
+                    self.jobs_read += 1
+                    if self._expect(',', ']') == ']':
+                        break
+            # members after the jobs array
+            if self._expect(',', '}') == ',':
+                self._read_members()
+
+    def jobs(self) -> Iterator[SlurmJob]:
+        for data in self.job_dicts():
+            yield SlurmJob.from_json(data, lazy=self.lazy, keep_tres=self.keep_tres, tres_store=self.tres_store)
+
+    __iter__ = jobs
+
+    def _read_members(self) -> bool:
+        """Read `"key": value` pairs up to the jobs array, True if it was found."""
+        if self._peek() == '}':
+            self._pos += 1
+            return False
+        while True:
+            key = self._value()
+            if not isinstance(key, str):
+                self._error("expected a member name")
+            self._expect(':')
+            if key == 'jobs':
+                return True
+            self.members[key] = self._value()
+            if self._expect(',', '}') == '}':
+                return False
+
+    def _fill(self) -> bool:
+        """Append a chunk to the buffer, dropping what has been consumed; False at end of file."""
+        if self._eof:
+            return False
+        # a value that did not fit in the buffer gets a larger read
+        size = max(self._chunk_size, len(self._buf) - self._pos)
+        chunk = self._fh.read(size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        """Next non-whitespace character, '' at end of file."""
+        while True:
+            self._pos = _WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ''
+
+    def _expect(self, *chars: str) -> str:
+        char = self._peek()
+        if char not in chars:
+            self._error(f"expected {' or '.join(repr(c) for c in chars)}, found {char!r}" if char
+                        else f"unexpected end of input, expected {' or '.join(repr(c) for c in chars)}")
+        self._pos += 1
+        return char
+
+    def _value(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # a number reaching the end of the buffer may continue in the next
+            # chunk, and raw_decode stops early at a partial exponent or fraction
+            # ("1." or "2e"), so read on until the number is followed by something else
+            if (isinstance(value, (int, float)) and not isinstance(value, bool)
+                    and _NUMBER_CHARS.match(self._buf, self._pos).end() == len(self._buf) and self._fill()):
+                continue
+            self._pos = end
+            return value
+
+    def _error(self, message: str):
+        raise json.JSONDecodeError(message, self._buf, self._pos)
+
+
+def read_jobs(path: str, lazy: bool = False, keep_tres: bool = True,
+              tres_store: Optional[TRESStore] = None) -> Iterator[SlurmJob]:
+    """The jobs of a `sacct --json` file as SlurmJob instances."""
+    with open(path) as fh:
+        yield from SacctJsonReader(fh, lazy=lazy, keep_tres=keep_tres, tres_store=tres_store)
+
+
+def write_json_lines(job_dicts: Iterable[Dict[str, Any]], out: IO[str]) -> int:
+    """Write one job per line; returns the number of jobs."""
+    n = 0
+    for data in job_dicts:
+        out.write(json.dumps(data, separators=(',', ':')))
+        out.write('\n')
+        n += 1
+    return n
+
+
+def read_json_lines(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """The job dicts of JSON Lines written by write_json_lines()."""
+    loads = json.loads
+    for line in lines:
+        if line.strip():
+            yield loads(line)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Convert `sacct --json` output to JSON Lines, one job per line.")
+    parser.add_argument('json_file', nargs='?',
+                        help="sacct --json output to read (default: stdin)")
+    parser.add_argument('--output', '-o', metavar='PATH',
+                        help="write to PATH instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    fh = open(args.json_file) if args.json_file else sys.stdin
+    out = open(args.output, 'w') if args.output else sys.stdout
+    with fh:
+        reader = SacctJsonReader(fh)
+        n = write_json_lines(reader.job_dicts(), out)
+    if args.output:
+        out.close()
+        print(f"{n} jobs written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
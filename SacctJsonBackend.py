@@ -0,0 +1,352 @@
+#!/usr/bin/env python
+"""
+Decoder backends for `sacct --json` output.
+
+    msgspec   decodes the bytes straight into typed structs holding only the
+              fields SlurmJob/JobStep/TimeInfo/TRESData read (TRES entries go
+              directly into TRESItem), with no intermediate dicts; with
+              keep_tres=False only the few TRES entries behind the steps'
+              numbers are decoded and everything else is skipped
+    orjson    fast C decoding into dicts, then SlurmJob.from_json()
+    json      the standard library, then SlurmJob.from_json()
+
+'auto' picks the first one that is installed.  Jobs from the msgspec backend
+have LazyJobStep steps (see JobStep.py) with time, tres and exit_code already
+decoded; the typed structs only hold what a LazyJobStep keeps, so with
+lazy=False msgspec decodes dicts for SlurmJob.from_json() like the others.
+
+A whole document has to be decoded at once by these backends, so
+SacctJson.SacctJsonReader stays the way to stream large documents; JSON
+Lines (one job per line, see SacctJson.py) are decoded a line at a time.
+
+Run as a script, it checks that every installed backend gives the same
+seff_stats() as SlurmJob.from_json() for the jobs of a document, both whole
+and a job per line:
+
+    ./SacctJsonBackend.py text_files/sacct_alloc.json
+"""
+import argparse
+import gc
+import json
+import sys
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from JobStep import ExitCode, LazyJobStep
+from SlurmJob import RequiredResources, SlurmJob
+from SlurmTime import TimeComponent, TimeInfo
+from SlurmTres import TRESData, TRESItem
+
+BACKENDS = ('msgspec', 'orjson', 'json')
+
+
+def available_backends() -> List[str]:
+    available = []
+    for name in BACKENDS:
+        try:
+            __import__(name)
+        except ImportError:
+            continue
+        available.append(name)
+    return available
+
+
+def resolve_backend(name: str = 'auto') -> str:
+    """The backend to use for `name`; ValueError if a named one is not installed."""
+    available = available_backends()
+    if name == 'auto':
+        return available[0]
+    if name not in BACKENDS:
+        raise ValueError(f"unknown JSON backend {name!r}, expected auto or one of {', '.join(BACKENDS)}")
+    if name not in available:
+        raise ValueError(f"JSON backend {name!r} is not installed")
+    return name
+
+
+def _loads(backend: str) -> Callable[[bytes], Any]:
+    if backend == 'orjson':
+        import orjson
+        return orjson.loads
+    if backend == 'msgspec':
+        import msgspec
+        return msgspec.json.decode
+    import json
+    return json.loads
+
+
+def decode_jobs(data: bytes, backend: str = 'auto', lazy: bool = False,
+                keep_tres: bool = True) -> Tuple[Dict[str, Any], Iterator[SlurmJob]]:
+    """The top-level members other than jobs (meta...) and the SlurmJobs of a whole document."""
+    backend = resolve_backend(backend)
+    if backend == 'msgspec' and lazy:
+        document = _without_gc(_typed_decoders(keep_tres)[0].decode, data)
+        members = {'meta': document.meta, 'warnings': document.warnings, 'errors': document.errors}
+        return members, _release(document.jobs, lambda job: _slurm_job(job, keep_tres))
+
+    document = _without_gc(_loads(backend), data)
+    jobs = document.pop('jobs', None) or []
+    return document, _release(jobs, lambda job: SlurmJob.from_json(job, lazy=lazy, keep_tres=keep_tres))
+
+
+def job_decoder(backend: str = 'auto', lazy: bool = False, keep_tres: bool = True) -> Callable[[bytes], SlurmJob]:
+    """A function from one line of JSON Lines to a SlurmJob."""
+    backend = resolve_backend(backend)
+    if backend == 'msgspec' and lazy:
+        decode = _typed_decoders(keep_tres)[1].decode
+        return lambda line: _slurm_job(decode(line), keep_tres)
+
+    loads = _loads(backend)
+    return lambda line: SlurmJob.from_json(loads(line), lazy=lazy, keep_tres=keep_tres)
+
+
+def _without_gc(decode: Callable[[bytes], Any], data: bytes) -> Any:
+    # a document decodes into millions of objects, none of them garbage, and
+    # the collector would otherwise rescan them all many times over
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return decode(data)
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _release(items: list, convert: Callable) -> Iterator:
+    # drop each decoded job once it is converted
+    for i, item in enumerate(items):
+        items[i] = None
+        yield convert(item)
+
+
+# the msgspec decoders, built on first use so that msgspec stays optional;
+# keyed on keep_tres
+_DECODERS = {}
+
+
+def _typed_decoders(keep_tres: bool = True):
+    """msgspec decoders of a whole document and of one job."""
+    if keep_tres in _DECODERS:
+        return _DECODERS[keep_tres]
+
+    import msgspec
+
+    # the leaf structs cannot form cycles, so they are left out of the garbage collector
+    class _TimeComponent(msgspec.Struct, gc=False):
+        seconds: int = 0
+        microseconds: int = 0
+
+    class _Time(msgspec.Struct, gc=False):
+        elapsed: Optional[int] = None
+        start: Optional[int] = None
+        end: Optional[int] = None
+        suspended: Optional[int] = None
+        system: Optional[_TimeComponent] = None
+        user: Optional[_TimeComponent] = None
+        total: Optional[_TimeComponent] = None
+
+    # the job's allocated TRES, a handful of entries, are always kept for
+    # SlurmJob.allocated_cpus()/allocated_memory()
+    # allocated is a plain list, or like the other categories a dict of summaries
+    # (see SlurmTres.allocated_items())
+    class _JobTRES(msgspec.Struct):
+        allocated: Union[List[TRESItem], Dict[str, List[TRESItem]]] = []
+
+    if keep_tres:
+        # every entry becomes a TRESItem of the step's TRESData
+        class _StepTRES(msgspec.Struct):
+            requested: Dict[str, List[TRESItem]] = {}
+            consumed: Dict[str, List[TRESItem]] = {}
+            allocated: Union[List[TRESItem], Dict[str, List[TRESItem]]] = []
+    else:
+        # only the entries behind LazyJobStep's numbers, the rest is skipped unparsed
+        class _TRESCount(msgspec.Struct, gc=False):
+            type: str = ""
+            count: Optional[int] = None
+
+        class _Peaks(msgspec.Struct):
+            max: List[_TRESCount] = []
+
+        class _StepTRES(msgspec.Struct):
+            requested: _Peaks = msgspec.field(default_factory=_Peaks)
+            consumed: _Peaks = msgspec.field(default_factory=_Peaks)
+            allocated: Union[List[_TRESCount], Dict[str, List[_TRESCount]]] = []
+
+    class _StepName(msgspec.Struct):
+        id: Optional[Dict[str, Any]] = None
+        name: Optional[str] = None
+
+    class _Step(msgspec.Struct):
+        time: Optional[_Time] = None
+        tres: Optional[_StepTRES] = None
+        state: str = ""
+        exit_code: Optional[Dict[str, Any]] = None
+        step: Optional[_StepName] = None
+
+    class _Job(msgspec.Struct):
+        job_id: Optional[int] = None
+        name: Optional[str] = None
+        nodes: Optional[str] = None
+        partition: Optional[str] = None
+        qos: Optional[str] = None
+        required: Dict[str, Any] = {}
+        time: Optional[_Time] = None
+        tres: Optional[_JobTRES] = None
+        steps: List[_Step] = []
+        submit_line: Optional[str] = None
+        working_directory: Optional[str] = None
+
+    class _Document(msgspec.Struct):
+        meta: Optional[Dict[str, Any]] = None
+        jobs: List[_Job] = []
+        warnings: List[Any] = []
+        errors: List[Any] = []
+
+    _DECODERS[keep_tres] = (msgspec.json.Decoder(_Document), msgspec.json.Decoder(_Job))
+    return _DECODERS[keep_tres]
+
+
+def _time_component(component) -> Optional[TimeComponent]:
+    if component is None:
+        return None
+    return TimeComponent({"seconds": component.seconds, "microseconds": component.microseconds})
+
+
+def _time_info(time) -> Optional[TimeInfo]:
+    if time is None or time.elapsed is None:
+        return None
+    return TimeInfo(elapsed=time.elapsed,
+                    start=time.start if time.start is not None else -1,
+                    end=time.end if time.end is not None else -1,
+                    suspended=time.suspended if time.suspended is not None else -1,
+                    system=_time_component(time.system),
+                    user=_time_component(time.user),
+                    total=_time_component(time.total))
+
+
+def _first_count(items, resource_type: str) -> Optional[int]:
+    for item in items:
+        if item.type == resource_type:
+            return item.count
+    return None
+
+
+def _peaks(summaries) -> list:
+    # a dict of all the summaries with keep_tres, else a struct of just max
+    if isinstance(summaries, dict):
+        return summaries.get("max", ())
+    return summaries.max
+
+
+def _allocated(allocated) -> list:
+    # the total of a dict of summaries
+    if isinstance(allocated, dict):
+        return allocated.get("total", [])
+    return allocated
+
+
+def _step(step, keep_tres: bool) -> LazyJobStep:
+    tres = step.tres
+    allocated = _allocated(tres.allocated) if tres else []
+    alloc_mem = _first_count(allocated, "mem")
+    max_mem = None
+    if tres:
+        # as SlurmTres.peak_memory() for the raw dicts
+        max_mem = _first_count(_peaks(tres.requested), "mem")
+        if max_mem is None:
+            max_mem = _first_count(_peaks(tres.consumed), "mem")
+
+    total = step.time.total if step.time else None
+    return LazyJobStep(name=step.step.name if step.step else None,
+                       step_id=step.step.id if step.step else None,
+                       state=step.state,
+                       elapsed=step.time.elapsed if step.time else None,
+                       cpu_seconds=total.seconds + total.microseconds / 1_000_000 if total else 0.0,
+                       alloc_cpus=_first_count(allocated, "cpu"),
+                       alloc_mem=alloc_mem * 1024 ** 2 if alloc_mem is not None else None,
+                       max_mem=max_mem,
+                       time=_time_info(step.time),
+                       tres=TRESData(requested=tres.requested, consumed=tres.consumed,
+                                     allocated={'total': allocated}) if tres and keep_tres else None,
+                       exit_code=ExitCode.from_json(step.exit_code) if step.exit_code else None)
+
+
+def _slurm_job(job, keep_tres: bool) -> SlurmJob:
+    required = job.required or {}
+    return SlurmJob(job_id=job.job_id,
+                    name=job.name,
+                    nodes=job.nodes,
+                    partition=job.partition,
+                    qos=job.qos,
+                    required=RequiredResources(required),
+                    required_cpus=required.get("CPUs", 0),
+                    required_memory_per_cpu=(required.get("memory_per_cpu") or {}).get("number", 0),
+                    time=_time_info(job.time),
+                    steps=[_step(step, keep_tres) for step in job.steps],
+                    submit_line=job.submit_line,
+                    working_directory=job.working_directory,
+                    tres=TRESData(requested={}, consumed=None, allocated={'total': _allocated(job.tres.allocated)}) if job.tres else None)
+
+
+def parity_errors(data: bytes) -> List[str]:
+    """Where the installed backends' jobs differ from SlurmJob.from_json() on a document."""
+    job_dicts = json.loads(data).get('jobs') or ()
+    lines = [json.dumps(job) for job in job_dicts]
+    errors = []
+    for lazy in (False, True):
+        for keep_tres in (True, False):
+            reference = [_job_fields(SlurmJob.from_json(job, lazy=lazy, keep_tres=keep_tres)) for job in job_dicts]
+            for backend in available_backends():
+                label = f"{backend} lazy={lazy} keep_tres={keep_tres}"
+                decode = job_decoder(backend, lazy=lazy, keep_tres=keep_tres)
+                decoded = {'document': [_job_fields(job) for job in decode_jobs(data, backend, lazy, keep_tres)[1]],
+                           'lines': [_job_fields(decode(line)) for line in lines]}
+                for form, jobs in decoded.items():
+                    if len(jobs) != len(reference):
+                        errors.append(f"{label} {form}: {len(jobs)} jobs, expected {len(reference)}")
+                        continue
+                    for got, expected in zip(jobs, reference):
+                        for key in expected:
+                            if got.get(key) != expected[key]:
+                                errors.append(f"{label} {form}: job {expected['seff_stats']['Job ID']} {key}: "
+                                              f"{got.get(key)!r} != {expected[key]!r}")
+    return errors
+
+
+# what parity_errors() compares of each step
+_STEP_FIELDS = ('name', 'step_id', 'state', 'exit_code', 'nodes', 'pid',
+                'elapsed', 'cpu_seconds', 'alloc_cpus', 'alloc_mem', 'max_mem')
+
+
+def _job_fields(job: SlurmJob) -> Dict[str, Any]:
+    fields = {'seff_stats': job.seff_stats(), 'steps': len(job.steps)}
+    for i, step in enumerate(job.steps):
+        fields[f"step {i} type"] = type(step).__name__
+        for name in _STEP_FIELDS:
+            if hasattr(step, name):
+                fields[f"step {i} {name}"] = getattr(step, name)
+        fields[f"step {i} time"] = repr(step.time)
+        tres = step.tres
+        fields[f"step {i} tres"] = (tres.requested, tres.consumed, tres.allocated) if tres is not None else None
+    return fields
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Check the JSON backends against SlurmJob.from_json() on `sacct --json` output.")
+    parser.add_argument('json_files', nargs='+', metavar='json_file')
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    failed = False
+    for path in args.json_files:
+        with open(path, 'rb') as f:
+            errors = parity_errors(f.read())
+        for error in errors:
+            print(f"{path}: {error}", file=sys.stderr)
+        print(f"{path}: {'FAIL' if errors else 'ok'} ({', '.join(available_backends())})")
+        failed = failed or bool(errors)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+"""
+parse_sacct.py's seff rows straight from `sacct --json` output.
+
+Each job of the jobs array is turned into a JobRecord in one pass over its
+raw `steps` dicts, without building SlurmJob/JobStep/TRESData objects:
+
+    total_cpu    sum of the steps' time.total (user + system)
+    elapsed      max of the steps' time.elapsed
+    max_rss      max of the steps' peak memory TRES (requested.max mem,
+                 where sacct's json output puts MaxRSS, else consumed.max)
+    alloc_cpus   cpu and mem of the job's tres.allocated, else of its steps'
+    req_mem
+
+calculate_efficiencies() and the sinks of parse_sacct.py then produce the
+same columns as the text pipeline, so one JSON dump can replace it:
+
+    sacct --json -a -S 2024-03-01 > march.json
+    ./SacctJsonSeff.py march.json > march.tsv
+"""
+import argparse
+import sys
+import time
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from parse_sacct import calculate_efficiencies, open_sink, seff_output_tsv_row, seff_output_typed_row
+from SacctJson import SacctJsonReader
+from SacctRecord import JobRecord
+from SlurmTime import parse_sacct_timestamp
+from SlurmTres import allocated_items, peak_memory, tres_count
+
+SACCT_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+def _sacct_time(epoch: Optional[int]) -> str:
+    # sacct prints times in the cluster's local time and 0 as Unknown
+    if not epoch:
+        return "Unknown"
+    return time.strftime(SACCT_TIME_FORMAT, time.localtime(epoch))
+
+
+def _job_id(data: Dict[str, Any]) -> str:
+    """JobID as sacct prints it, array_task for array tasks."""
+    array = data.get("array") or {}
+    task = array.get("task_id") or {}
+    if array.get("job_id") and task.get("set"):
+        return f"{array['job_id']}_{task.get('number')}"
+    if array.get("job_id") and array.get("task"):
+        # pending tasks of an array, e.g. [5-10%2]
+        return f"{array['job_id']}_[{array['task']}]"
+    return str(data.get("job_id", ""))
+
+
+def _state(data: Dict[str, Any]) -> str:
+    state = data.get("state") or {}
+    current = state.get("current", "") if isinstance(state, dict) else state
+    # newer data_parser versions give a list of flags
+    return " ".join(current) if isinstance(current, list) else current
+
+
+def _exit_code(data: Dict[str, Any]) -> str:
+    exit_code = data.get("exit_code") or {}
+    signal = exit_code.get("signal") or {}
+    return_code = exit_code.get("return_code", 0)
+    if isinstance(return_code, dict):
+        return_code = return_code.get("number", 0)
+    return f"{return_code}:{signal.get('id', signal.get('signal_id', 0)) if isinstance(signal, dict) else 0}"
+
+
+def job_record(data: Dict[str, Any]) -> JobRecord:
+    """An aggregated JobRecord, without efficiencies, of one job of the jobs array."""
+    total_cpu = 0.0
+    elapsed = 0
+    max_rss = 0
+    names = [data.get("name") or ""]
+    step_allocated = None
+
+    # the one pass over the steps
+    for step in data.get("steps") or ():
+        time_data = step.get("time") or {}
+        total = time_data.get("total")
+        if total:
+            total_cpu += total.get("seconds", 0) + total.get("microseconds", 0) / 1_000_000
+        step_elapsed = time_data.get("elapsed") or 0
+        if step_elapsed > elapsed:
+            elapsed = step_elapsed
+
+        tres = step.get("tres") or {}
+        peak = peak_memory(tres)
+        if peak and peak > max_rss:
+            max_rss = peak
+        if step_allocated is None:
+            step_allocated = allocated_items(tres)
+
+        name = (step.get("step") or {}).get("name")
+        if name:
+            names.append(name)
+
+    allocated = allocated_items(data.get("tres") or {}) or step_allocated
+    alloc_cpus = tres_count(allocated, "cpu")
+    if not alloc_cpus:
+        alloc_cpus = (data.get("required") or {}).get("CPUs") or 0
+    alloc_mem = tres_count(allocated, "mem") or 0  # MiB
+
+    job_time = data.get("time") or {}
+    association = data.get("association") or {}
+    record = JobRecord(JobID=_job_id(data),
+                       User=data.get("user") or association.get("user", ""),
+                       Group=data.get("group", ""),
+                       State=_state(data),
+                       Cluster=data.get("cluster") or association.get("cluster", ""),
+                       ExitCode=_exit_code(data),
+                       NNodes=str(data.get("allocation_nodes", "")),
+                       NTasks="",
+                       AllocCPUS=str(alloc_cpus),
+                       REQMEM=f"{alloc_mem}M" if alloc_mem else "",
+                       Submit=_sacct_time(job_time.get("submission")),
+                       Start=_sacct_time(job_time.get("start")),
+                       End=_sacct_time(job_time.get("end")),
+                       Account=data.get("account") or association.get("account", ""),
+                       JobNames=",".join(name for name in names if name))
+
+    record.alloc_cpus = alloc_cpus
+    record.req_mem = alloc_mem * 1024 ** 2
+    record.total_cpu = total_cpu
+    record.elapsed = float(elapsed)
+    record.max_rss = max_rss
+    # the same epochs the text pipeline reads from these strings, so that the
+    # typed sinks get identical timestamps from either input
+    record.submit_time = parse_sacct_timestamp(record.Submit)
+    record.start_time = parse_sacct_timestamp(record.Start)
+    record.end_time = parse_sacct_timestamp(record.End)
+    return record
+
+
+def iter_json_results(job_dicts: Iterable[Dict[str, Any]]) -> Iterator[JobRecord]:
+    for data in job_dicts:
+        yield calculate_efficiencies(job_record(data))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="seff-style TSV rows, like parse_sacct.py's, from `sacct --json` output.")
+    parser.add_argument('json_file', nargs='?',
+                        help="sacct --json output to read (default: stdin)")
+    output = parser.add_argument_group('output', "TSV on stdout unless another sink is given")
+    output.add_argument('--sqlite', metavar='PATH',
+                        help="upsert the rows into an SQLite database keyed on JobID instead of printing TSV")
+    output.add_argument('--sqlite-table', default='jobs', metavar='NAME',
+                        help="table for --sqlite (default: %(default)s)")
+    columnar = output.add_mutually_exclusive_group()
+    columnar.add_argument('--parquet', metavar='PATH',
+                          help="write typed columns to a Parquet file (requires pyarrow)")
+    columnar.add_argument('--arrow', metavar='PATH',
+                          help="like --parquet but as an Arrow IPC file")
+    output.add_argument('--row-group-size', type=int, default=65536, metavar='N',
+                        help="rows per Parquet row group / Arrow record batch (default: %(default)s)")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    sink = open_sink(args)
+    make_row = seff_output_typed_row if sink.typed else seff_output_tsv_row
+
+    fh = open(args.json_file) if args.json_file else sys.stdin
+    with fh:
+        sink.start()
+        for record in iter_json_results(SacctJsonReader(fh).job_dicts()):
+            sink.write(make_row(record))
+    sink.close()
+
+
+if __name__ == "__main__":
+    main()
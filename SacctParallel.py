@@ -0,0 +1,157 @@
+"""
+Multi-process parsing of large `sacct -P` dump files.
+
+The file is cut into byte ranges whose boundaries fall where the JobID prefix
+changes, so every step group is parsed by exactly one worker.  Each worker
+aggregates its range into TSV text and the chunks are written back in file order.
+"""
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from SacctDecoder import SacctDecoder, is_header, job_id_prefix, parse_format
+from SacctFilter import RowFilter
+
+# upper bound on the bytes handed to one worker at a time; keeps the
+# buffered TSV output of in-flight chunks small and the load balanced
+CHUNK_BYTES = 64 * 1024 * 1024
+
+
+def _next_group_start(fh, offset: int) -> int:
+    """Byte offset of the first job group that starts after the line containing `offset`."""
+    if offset == 0:
+        return 0
+
+    # finish the line that `offset` falls into
+    fh.seek(offset - 1)
+    fh.readline()
+
+    prefix = None
+    while True:
+        position = fh.tell()
+        line = fh.readline()
+        if not line:
+            return position
+        line = line.decode()
+        if not line.strip() or is_header(line):
+            continue
+
+        line_prefix = job_id_prefix(line.partition('|')[0])
+        if prefix is None:
+            prefix = line_prefix
+        elif line_prefix != prefix:
+            return position
+
+
+def split_job_groups(path: str, n_chunks: int) -> List[Tuple[int, int]]:
+    """Split `path` into up to `n_chunks` (start, end) byte ranges aligned to job groups."""
+    size = os.path.getsize(path)
+    boundaries = [0]
+    with open(path, 'rb') as fh:
+        for i in range(1, n_chunks):
+            target = size * i // n_chunks
+            if target <= boundaries[-1]:
+                continue
+            offset = _next_group_start(fh, target)
+            if offset >= size:
+                break
+            if offset > boundaries[-1]:
+                boundaries.append(offset)
+    boundaries.append(size)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def split_line_ranges(path: str, n_chunks: int) -> List[Tuple[int, int]]:
+    """Split `path` into up to `n_chunks` (start, end) byte ranges aligned to lines, e.g. for JSON Lines."""
+    size = os.path.getsize(path)
+    boundaries = [0]
+    with open(path, 'rb') as fh:
+        for i in range(1, n_chunks):
+            target = size * i // n_chunks
+            if target <= boundaries[-1]:
+                continue
+            # the start of the line after the one containing `target`
+            fh.seek(target - 1)
+            fh.readline()
+            offset = fh.tell()
+            if offset >= size:
+                break
+            if offset > boundaries[-1]:
+                boundaries.append(offset)
+    boundaries.append(size)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def read_range(path: str, start: int, end: int) -> Iterator[str]:
+    """Lines of `path` between byte offsets start and end."""
+    remaining = end - start
+    with open(path, 'rb') as fh:
+        fh.seek(start)
+        for line in fh:
+            if remaining <= 0:
+                break
+            remaining -= len(line)
+            yield line.decode()
+
+
+def _parse_chunk(task: Tuple[str, int, int, Sequence[str], int, bool, bool, Sequence[str]]) -> Union[str, List[list]]:
+    # parse_sacct imports this module from main(), so import it lazily here
+    from parse_sacct import parse_sacct_lines, iter_results, seff_output_tsv_row, seff_output_typed_row
+
+    path, start, end, columns, batch_size, as_text, typed, filters = task
+    make_row = seff_output_typed_row if typed else seff_output_tsv_row
+    decoder = SacctDecoder(columns)
+    row_filter = RowFilter(filters) if filters else None
+    groups = parse_sacct_lines(read_range(path, start, end), decoder, row_filter)
+    rows = [make_row(record) for record in iter_results(groups, batch_size)]
+    if not as_text:
+        return rows
+    return "".join("\t".join(map(str, row)) + "\n" for row in rows)
+
+
+def ordered_map(fn: Callable, tasks: Iterable, workers: int, window: int = 0) -> Iterator:
+    """
+    Map `fn` over `tasks` in a process pool, yielding results in task order.
+
+    At most `window` tasks (default 2 per worker) are in flight, so results
+    are never buffered far ahead of the consumer.
+    """
+    window = window or 2 * workers
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(fn, task))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def parse_file_parallel(path: str, decoder: SacctDecoder, sink, workers: int, batch_size: int = 0,
+                        row_filter: Optional[RowFilter] = None):
+    """Write the seff rows for the dump at `path` to `sink` using `workers` processes."""
+    # a -P header on the first line names the columns for every worker
+    with open(path) as fh:
+        first_line = fh.readline()
+    if is_header(first_line):
+        decoder.set_columns(parse_format(first_line))
+    if row_filter is not None:
+        # raise a FilterError here rather than in every worker, before any output
+        row_filter.bind(decoder.row_type._fields)
+        row_filter.bind_group(decoder.row_type._fields)
+
+    size = os.path.getsize(path)
+    n_chunks = max(workers, -(-size // CHUNK_BYTES))
+    filters = row_filter.texts() if row_filter else ()
+    tasks = ((path, start, end, decoder.columns, batch_size, sink.accepts_text, sink.typed, filters)
+             for start, end in split_job_groups(path, n_chunks))
+
+    sink.start(decoder.extra_fields)
+    for result in ordered_map(_parse_chunk, tasks, workers):
+        if sink.accepts_text:
+            sink.write_text(result)
+        else:
+            for row in result:
+                sink.write(row)
+    sink.close()
@@ -0,0 +1,181 @@
+"""
+Stage timers for parse_sacct.py --profile.
+
+The pipeline is a chain of generators, so a stage is timed by wrapping either
+its iterator (read, parse) or the function it calls per job (aggregate,
+efficiency, output).  Time is exclusive: a stage that pulls from another, like
+parse pulling lines from read, is charged only for its own work.  Nothing is
+wrapped unless --profile is given.
+"""
+import cProfile
+import io
+import json
+import pstats
+import resource
+import sys
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+# summary order of the stages; a run only has some of them
+STAGES = ('read', 'parse', 'group', 'checkpoint', 'aggregate', 'efficiency', 'batch', 'rollup', 'format', 'write')
+
+# hot functions listed in the summary when --cprofile is given
+CPROFILE_TOP = 15
+
+
+def peak_rss_bytes() -> int:
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class StageTimer:
+    __slots__ = ('calls', 'seconds')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+
+
+class Profiler:
+    """Exclusive wall time and call counts per pipeline stage."""
+
+    def __init__(self, cprofile_path: Optional[str] = None, cache_stats: Optional[Callable[[], Dict]] = None):
+        self.stages: Dict[str, StageTimer] = {}
+        # SacctDecoder.conversion_cache_stats, reported with the stage times
+        self.cache_stats = cache_stats
+        self.lines = 0
+        self.jobs = 0
+        self.cprofile_path = cprofile_path
+        self._cprofile = cProfile.Profile() if cprofile_path else None
+        # time spent in nested stages, one entry per open stage
+        self._children = []
+        self._start = None
+        self.elapsed = 0.0
+
+    def start(self):
+        self._start = time.perf_counter()
+        if self._cprofile:
+            self._cprofile.enable()
+
+    def stop(self):
+        if self._cprofile:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self.cprofile_path)
+        if self._start is not None:
+            self.elapsed = time.perf_counter() - self._start
+
+    def _timer(self, stage: str) -> StageTimer:
+        timer = self.stages.get(stage)
+        if timer is None:
+            timer = self.stages[stage] = StageTimer()
+        return timer
+
+    def wrap(self, stage: str, fn: Callable) -> Callable:
+        """fn, charging each call to `stage`."""
+        timer = self._timer(stage)
+        children = self._children
+        clock = time.perf_counter
+
+        def timed(*args):
+            start = clock()
+            children.append(0.0)
+            try:
+                return fn(*args)
+            finally:
+                elapsed = clock() - start
+                timer.seconds += elapsed - children.pop()
+                timer.calls += 1
+                if children:
+                    children[-1] += elapsed
+        return timed
+
+    def iter(self, stage: str, iterable: Iterable[Any]) -> Iterator[Any]:
+        """The items of iterable, charging the time to produce each one to `stage`."""
+        return _TimedIterator(iter(iterable), self.wrap(stage, next))
+
+    def count_lines(self, lines: Iterable[str]) -> Iterator[str]:
+        for line in self.iter('read', lines):
+            self.lines += 1
+            yield line
+
+    def count_jobs(self, records: Iterable[Any]) -> Iterator[Any]:
+        for record in records:
+            self.jobs += 1
+            yield record
+
+    def summary(self, decoder=None, row_filter=None) -> Dict[str, Any]:
+        elapsed = self.elapsed
+        stages = {}
+        order = [stage for stage in STAGES if stage in self.stages]
+        order += [stage for stage in self.stages if stage not in STAGES]
+        for stage in order:
+            timer = self.stages[stage]
+            stages[stage] = {'seconds': timer.seconds,
+                             'calls': timer.calls,
+                             'share': timer.seconds / elapsed if elapsed else 0.0}
+        summary = {'elapsed': elapsed,
+                   'lines': self.lines,
+                   'jobs': self.jobs,
+                   'lines_per_second': self.lines / elapsed if elapsed else 0.0,
+                   'jobs_per_second': self.jobs / elapsed if elapsed else 0.0,
+                   'peak_rss_bytes': peak_rss_bytes(),
+                   'stages': stages}
+        if self.cache_stats is not None:
+            summary['conversion_caches'] = self.cache_stats()
+        if decoder is not None:
+            summary['interned_columns'] = decoder.intern_stats()
+        if row_filter is not None:
+            summary['jobs_filtered'] = row_filter.rejected
+        if self.cprofile_path:
+            summary['cprofile'] = self.cprofile_path
+        return summary
+
+    def report(self, decoder=None, row_filter=None, json_path: Optional[str] = None, out=sys.stderr):
+        summary = self.summary(decoder, row_filter)
+        if json_path:
+            with open(json_path, 'w') as fh:
+                json.dump(summary, fh, indent=2)
+            return
+
+        print(f"profile: {summary['elapsed']:.3f} s, {summary['lines']} lines ({summary['lines_per_second']:.0f}/s), "
+              f"{summary['jobs']} jobs ({summary['jobs_per_second']:.0f}/s), "
+              f"peak RSS {summary['peak_rss_bytes'] / 1024 ** 2:.1f} MiB", file=out)
+        if 'jobs_filtered' in summary:
+            print(f"  {summary['jobs_filtered']} jobs dropped by filters", file=out)
+        print("stages:", file=out)
+        for stage, stats in summary['stages'].items():
+            print(f"  {stage:<12} {stats['seconds']:9.3f} s {100 * stats['share']:5.1f}% {stats['calls']:>10} calls", file=out)
+        if 'conversion_caches' in summary:
+            print("conversion caches:", file=out)
+        for name, stats in summary.get('conversion_caches', {}).items():
+            print(f"  {name}: {100 * stats['hit_rate']:.1f}% hits of {stats['hits'] + stats['misses']} lookups", file=out)
+        if 'interned_columns' in summary:
+            print("interned columns:", file=out)
+        for field, stats in summary.get('interned_columns', {}).items():
+            if field != 'overflow':
+                print(f"  {field}: {100 * stats['hit_rate']:.1f}% shared, {stats['distinct']} distinct", file=out)
+        if self.cprofile_path:
+            print(f"hot functions (full stats in {self.cprofile_path}):", file=out)
+            listing = io.StringIO()
+            pstats.Stats(self.cprofile_path, stream=listing).sort_stats('tottime').print_stats(CPROFILE_TOP)
+            # skip the pstats preamble
+            lines = listing.getvalue().splitlines()
+            start = next((i for i, line in enumerate(lines) if line.lstrip().startswith('ncalls')), 0)
+            for line in lines[start:]:
+                if line.strip():
+                    print(f"  {line}", file=out)
+
+
+class _TimedIterator:
+    __slots__ = ('_it', '_next')
+
+    def __init__(self, it: Iterator[Any], timed_next: Callable):
+        self._it = it
+        self._next = timed_next
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self._next(self._it)
@@ -0,0 +1,85 @@
+"""
+Compact per-job record carried from aggregation to output in parse_sacct.py.
+
+The numeric fields are converted once when a job's step group is aggregated
+and the efficiencies are stored alongside them, so the output functions only
+format numbers and never re-parse sacct strings.
+"""
+from typing import Optional, Tuple
+
+
+class JobRecord:
+    """One aggregated job: descriptive sacct strings plus converted numbers."""
+
+    __slots__ = (
+        # top-level sacct strings, None when the group has no top-level row
+        'JobID', 'User', 'Group', 'State', 'Cluster', 'ExitCode',
+        'NNodes', 'NTasks', 'AllocCPUS', 'REQMEM',
+        'Submit', 'Start', 'End', 'Account', 'JobNames',
+        'extra',              # values of the extra input columns, in order
+        # converted once
+        'alloc_cpus',         # int
+        'req_mem',            # bytes
+        'total_cpu',          # seconds summed over the steps
+        'elapsed',            # whole seconds, max over the steps
+        'max_rss',            # bytes, max over the steps
+        'submit_time',        # epoch seconds of Submit, Start and End,
+        'start_time',         # None when sacct reports Unknown/None
+        'end_time',
+        # filled in by calculate_efficiencies()
+        'cpu_wall_time',      # elapsed * alloc_cpus
+        'cpu_efficiency',     # percent
+        'memory_efficiency',  # percent
+    )
+
+    def __init__(self, JobID: Optional[str] = None, User: Optional[str] = None, Group: Optional[str] = None,
+                 State: Optional[str] = None, Cluster: Optional[str] = None, ExitCode: Optional[str] = None,
+                 NNodes: Optional[str] = None, NTasks: Optional[str] = None, AllocCPUS: Optional[str] = None,
+                 REQMEM: Optional[str] = None, Submit: Optional[str] = None, Start: Optional[str] = None,
+                 End: Optional[str] = None, Account: Optional[str] = None, JobNames: str = '',
+                 extra: Tuple[str, ...] = ()):
+        self.JobID = JobID
+        self.User = User
+        self.Group = Group
+        self.State = State
+        self.Cluster = Cluster
+        self.ExitCode = ExitCode
+        self.NNodes = NNodes
+        self.NTasks = NTasks
+        self.AllocCPUS = AllocCPUS
+        self.REQMEM = REQMEM
+        self.Submit = Submit
+        self.Start = Start
+        self.End = End
+        self.Account = Account
+        self.JobNames = JobNames
+        self.extra = extra
+
+        self.alloc_cpus = 0
+        self.req_mem = 0
+        self.total_cpu = 0.0
+        self.elapsed = 0.0
+        self.max_rss = 0
+        self.submit_time = None
+        self.start_time = None
+        self.end_time = None
+        self.cpu_wall_time = 0.0
+        self.cpu_efficiency = 0.0
+        self.memory_efficiency = 0.0
+
+    @property
+    def wait_time(self) -> Optional[int]:
+        """Seconds queued from Submit to Start."""
+        if self.start_time is None or self.submit_time is None:
+            return None
+        return self.start_time - self.submit_time
+
+    @property
+    def timespan(self) -> Optional[int]:
+        """Seconds from Submit to End."""
+        if self.end_time is None or self.submit_time is None:
+            return None
+        return self.end_time - self.submit_time
+
+    def __repr__(self):
+        return f"JobRecord({self.JobID!r}, State={self.State!r}, total_cpu={self.total_cpu}, max_rss={self.max_rss})"
@@ -0,0 +1,360 @@
+"""
+Streaming rollups of aggregated jobs for parse_sacct.py.
+
+Jobs are folded into small per-key accumulators as they stream past, so
+memory grows with the number of keys (array jobs) rather than the number of
+jobs, and one row per key is written at the end of the input.
+"""
+import math
+from math import nan
+from bisect import bisect_left, bisect_right
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+from SacctRecord import JobRecord
+
+
+class RunningStats:
+    """Online count, sum, min, max, mean and variance (Welford), mergeable across partial results."""
+
+    __slots__ = ('count', 'total', 'min', 'max', 'mean', 'm2')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value: float):
+        if value != value:
+            # NaN efficiencies of zero-length jobs
+            return
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def merge(self, other: "RunningStats"):
+        if not other.count:
+            return
+        if not self.count:
+            for name in self.__slots__:
+                setattr(self, name, getattr(other, name))
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def std(self) -> float:
+        """Sample standard deviation, like R's sd(); 0 for fewer than two values."""
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def summary(self) -> Tuple[float, float, float, float]:
+        """(min, mean, max, std), NaN when nothing was added."""
+        if not self.count:
+            return nan, nan, nan, nan
+        return self.min, self.mean, self.max, self.std
+
+
+class RangeSet:
+    """
+    A set of integers kept as sorted, non-adjacent [start, end] intervals.
+
+    Array task ids are mostly consecutive, so a 10k task array usually costs
+    a handful of intervals instead of 10k ints.
+    """
+
+    __slots__ = ('_starts', '_ends')
+
+    def __init__(self):
+        self._starts: List[int] = []
+        self._ends: List[int] = []
+
+    @classmethod
+    def from_slurm(cls, spec: str) -> "RangeSet":
+        """Parse Slurm array task specs such as '6', '[1-3,5]', '[1-100%5]' or a truncated '[1-3,7-9,...'."""
+        ranges = cls()
+        for part in spec.strip('[]').split(','):
+            part = part.split('%', 1)[0].strip()
+            if not part or part.startswith('.'):
+                continue
+            lo, _, hi = part.partition('-')
+            try:
+                ranges.add(int(lo), int(hi.split(':', 1)[0]) if hi else None)
+            except ValueError:
+                continue
+        return ranges
+
+    def add(self, lo: int, hi: Optional[int] = None):
+        hi = lo if hi is None else hi
+        starts, ends = self._starts, self._ends
+        # common case: tasks arrive in increasing order
+        if ends and starts[-1] <= lo and lo <= ends[-1] + 1:
+            if hi > ends[-1]:
+                ends[-1] = hi
+            return
+        # intervals overlapping or adjacent to [lo, hi] collapse into one
+        i = bisect_left(ends, lo - 1)
+        j = bisect_right(starts, hi + 1)
+        if i < j:
+            lo = min(lo, starts[i])
+            hi = max(hi, ends[j - 1])
+        starts[i:j] = [lo]
+        ends[i:j] = [hi]
+
+    def update(self, other: "RangeSet"):
+        for lo, hi in other.intervals():
+            self.add(lo, hi)
+
+    def intervals(self) -> Iterator[Tuple[int, int]]:
+        return zip(self._starts, self._ends)
+
+    def __contains__(self, value: int) -> bool:
+        i = bisect_right(self._starts, value) - 1
+        return i >= 0 and value <= self._ends[i]
+
+    def __len__(self) -> int:
+        return sum(hi - lo + 1 for lo, hi in self.intervals())
+
+    def __str__(self) -> str:
+        return ",".join(str(lo) if lo == hi else f"{lo}-{hi}" for lo, hi in self.intervals())
+
+    def __repr__(self):
+        return f"RangeSet('{self}')"
+
+
+def split_array_job_id(job_id: Optional[str]) -> Optional[Tuple[str, str]]:
+    """('12078642', '6') for an array task JobID like 12078642_6, None for other jobs."""
+    if not job_id:
+        return None
+    array_id, sep, task = job_id.partition('_')
+    if not sep or not task:
+        return None
+    return array_id, task
+
+
+def base_state(state: Optional[str]) -> str:
+    # 'CANCELLED by 1234' -> 'CANCELLED'
+    return state.split(' ', 1)[0] if state else ''
+
+
+class _ArrayStats:
+    __slots__ = ('tasks', 'states', 'User', 'Account',
+                 'total_cpu', 'max_cpu', 'total_rss', 'max_rss',
+                 'cpu_efficiency', 'memory_efficiency')
+
+    def __init__(self, record: JobRecord):
+        self.tasks = RangeSet()
+        self.states: Dict[str, int] = {}
+        self.User = record.User
+        self.Account = record.Account
+        self.total_cpu = 0.0
+        self.max_cpu = 0.0
+        self.total_rss = 0
+        self.max_rss = 0
+        self.cpu_efficiency = RunningStats()
+        self.memory_efficiency = RunningStats()
+
+
+ARRAY_ROLLUP_COLUMNS = ('ArrayJobID',
+                        'User',
+                        'Account',
+                        'Tasks',
+                        'TaskIDs',
+                        'States',
+                        'TotalCPU_raw',
+                        'MaxCPU_raw',
+                        'TotalRSS_raw',
+                        'MaxRSS_raw',
+                        'CPU_Efficiency_min',
+                        'CPU_Efficiency_mean',
+                        'CPU_Efficiency_max',
+                        'CPU_Efficiency_std',
+                        'memory_efficiency_min',
+                        'memory_efficiency_mean',
+                        'memory_efficiency_max',
+                        'memory_efficiency_std')
+
+
+class ArrayRollup:
+    """
+    Per array job totals over its tasks.
+
+    Each task record adds its id to the array's RangeSet and its usage to
+    the totals and efficiency statistics.  A pending array record such as
+    12078642_[10-10000%50] adds all of its task ids as PENDING at once.
+    Pending tasks have no usage and are left out of the efficiency spread.
+    Jobs that are not array tasks are ignored.
+    """
+
+    def __init__(self):
+        self.arrays: Dict[str, _ArrayStats] = {}
+
+    def start(self, extra_fields: Sequence[str] = ()):
+        pass
+
+    def add(self, record: JobRecord) -> bool:
+        """Fold one aggregated job into its array; False if it is not an array task."""
+        split = split_array_job_id(record.JobID)
+        if split is None:
+            return False
+        array_id, task = split
+
+        stats = self.arrays.get(array_id)
+        if stats is None:
+            self.arrays[array_id] = stats = _ArrayStats(record)
+
+        state = base_state(record.State)
+        if task.startswith('['):
+            tasks = RangeSet.from_slurm(task)
+            stats.tasks.update(tasks)
+            stats.states[state] = stats.states.get(state, 0) + len(tasks)
+            return True
+
+        try:
+            stats.tasks.add(int(task))
+        except ValueError:
+            return False
+        stats.states[state] = stats.states.get(state, 0) + 1
+        if state == 'PENDING':
+            return True
+
+        stats.total_cpu += record.total_cpu
+        stats.max_cpu = max(stats.max_cpu, record.total_cpu)
+        stats.total_rss += record.max_rss
+        stats.max_rss = max(stats.max_rss, record.max_rss)
+        stats.cpu_efficiency.add(record.cpu_efficiency)
+        stats.memory_efficiency.add(record.memory_efficiency)
+        return True
+
+    def rows(self) -> Iterator[list]:
+        """One row per array job in ARRAY_ROLLUP_COLUMNS order, in order of first appearance."""
+        for array_id, stats in self.arrays.items():
+            yield [array_id,
+                   stats.User,
+                   stats.Account,
+                   len(stats.tasks),
+                   str(stats.tasks),
+                   ",".join(f"{state}:{count}" for state, count in sorted(stats.states.items())),
+                   stats.total_cpu,
+                   stats.max_cpu,
+                   stats.total_rss,
+                   stats.max_rss,
+                   *stats.cpu_efficiency.summary(),
+                   *stats.memory_efficiency.summary()]
+
+    def write(self, out: TextIO):
+        print(*ARRAY_ROLLUP_COLUMNS, sep="\t", file=out)
+        for row in self.rows():
+            out.write("\t".join(map(str, row)) + "\n")
+
+
+def _seconds(value: Optional[int]) -> float:
+    # wait_time/timespan of jobs that have not started or ended yet
+    return nan if value is None else value
+
+
+# per-job values accumulated for every group; the names follow the seff TSV columns
+GROUP_METRICS: Tuple[Tuple[str, Callable[[JobRecord], float]], ...] = (
+    ('CPU_Utilized_raw', lambda record: record.total_cpu),
+    ('core_walltime_raw', lambda record: record.cpu_wall_time),
+    ('Elapsed_raw', lambda record: record.elapsed),
+    ('MaxRSS_Utilized_raw', lambda record: record.max_rss),
+    ('REQMEM', lambda record: record.req_mem),
+    ('CPU_Efficiency', lambda record: record.cpu_efficiency),
+    ('memory_efficiency', lambda record: record.memory_efficiency),
+    ('wait_time', lambda record: _seconds(record.wait_time)),
+    ('timespan', lambda record: _seconds(record.timespan)),
+)
+
+# JobRecord fields that can be grouped on, besides the extra input columns
+GROUP_BY_FIELDS = ('User', 'Group', 'Account', 'State', 'Cluster', 'NNodes', 'AllocCPUS')
+
+
+def group_key(keys: Sequence[str], extra_fields: Sequence[str] = ()) -> Callable[[JobRecord], tuple]:
+    """Function returning the values of the `keys` columns of a record, with State cut to its first word."""
+    getters = []
+    for key in keys:
+        if key in extra_fields:
+            getters.append(_extra_getter(extra_fields.index(key)))
+        elif key == 'State':
+            getters.append(lambda record: base_state(record.State))
+        elif key in GROUP_BY_FIELDS:
+            getters.append(_field_getter(key))
+        else:
+            raise ValueError(f"cannot group by {key!r}, expected one of {', '.join(GROUP_BY_FIELDS + tuple(extra_fields))}")
+
+    return lambda record: tuple(getter(record) for getter in getters)
+
+
+class GroupRollup:
+    """
+    One row per distinct value of the `keys` columns, e.g. ('User', 'Account').
+
+    Each group keeps a job count and a RunningStats per GROUP_METRICS entry,
+    written as <metric>_sum, _max, _mean and _std columns.  State is grouped
+    on its first word, so 'CANCELLED by 1234' counts as CANCELLED.
+    """
+
+    def __init__(self, keys: Sequence[str]):
+        self.keys = tuple(keys)
+        self.groups: Dict[tuple, List[RunningStats]] = {}
+        self.counts: Dict[tuple, int] = {}
+        self._key = None
+
+    def start(self, extra_fields: Sequence[str] = ()):
+        """Resolve the key columns once the extra input columns are known."""
+        self._key = group_key(self.keys, extra_fields)
+
+    def add(self, record: JobRecord) -> bool:
+        key = self._key(record)
+        stats = self.groups.get(key)
+        if stats is None:
+            self.groups[key] = stats = [RunningStats() for _ in GROUP_METRICS]
+            self.counts[key] = 0
+        self.counts[key] += 1
+        for accumulator, (name, metric) in zip(stats, GROUP_METRICS):
+            accumulator.add(metric(record))
+        return True
+
+    def columns(self) -> List[str]:
+        columns = list(self.keys) + ['num_jobs']
+        for name, _ in GROUP_METRICS:
+            columns += [f"{name}_sum", f"{name}_max", f"{name}_mean", f"{name}_std"]
+        return columns
+
+    def rows(self) -> Iterator[list]:
+        """One row per group in columns() order, in order of first appearance."""
+        for key, stats in self.groups.items():
+            row = list(key) + [self.counts[key]]
+            for accumulator in stats:
+                if accumulator.count:
+                    row += [accumulator.total, accumulator.max, accumulator.mean, accumulator.std]
+                else:
+                    row += [nan, nan, nan, nan]
+            yield row
+
+    def write(self, out: TextIO):
+        print(*self.columns(), sep="\t", file=out)
+        for row in self.rows():
+            out.write("\t".join(map(str, row)) + "\n")
+
+
+def _field_getter(name: str) -> Callable[[JobRecord], str]:
+    return lambda record: getattr(record, name)
+
+
+def _extra_getter(index: int) -> Callable[[JobRecord], str]:
+    return lambda record: record.extra[index] if record.extra else None
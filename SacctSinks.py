@@ -0,0 +1,269 @@
+"""
+Output sinks for the aggregated seff rows of parse_sacct.py.
+
+A sink is started once the extra columns of the input are known, receives one
+row per job in SEFF_TSV_COLUMNS order, or COLUMNAR_SCHEMA order for sinks
+with `typed` set, followed by the extra columns, and is closed at the end of
+the input.
+"""
+import sqlite3
+import sys
+from typing import Any, List, Optional, Sequence, TextIO, Tuple
+
+SEFF_TSV_COLUMNS = ('JobID',
+                    'User',
+                    'Group',
+                    'State',
+                    'ExitCode',
+                    'NNodes',
+                    'AllocCPUS',
+                    'CPU_Utilized',
+                    'CPU_Efficiency',
+                    'core_walltime',
+                    'Elapsed',
+                    'Elapsed_raw',
+                    'MaxRSS_Utilized',
+                    'MaxRSS_Utilized_raw',
+                    'REQMEM',
+                    'memory_efficiency',
+                    'JobNames',
+                    'Submit',
+                    'Start',
+                    'End',
+                    'Account',
+                    'wait_time',
+                    'timespan')
+
+
+# typed columns written by ColumnarSink: durations in whole seconds, sizes in
+# bytes and Submit/Start/End as timestamps instead of the formatted TSV strings;
+# wait_time (Submit to Start) and timespan (Submit to End) are seconds
+COLUMNAR_SCHEMA = (('JobID', 'string'),
+                   ('User', 'string'),
+                   ('Group', 'string'),
+                   ('State', 'string'),
+                   ('ExitCode', 'string'),
+                   ('NNodes', 'int64'),
+                   ('AllocCPUS', 'int64'),
+                   ('CPU_Utilized_raw', 'int64'),
+                   ('CPU_Efficiency', 'float64'),
+                   ('core_walltime_raw', 'int64'),
+                   ('Elapsed_raw', 'int64'),
+                   ('MaxRSS_Utilized_raw', 'int64'),
+                   ('REQMEM', 'int64'),
+                   ('memory_efficiency', 'float64'),
+                   ('JobNames', 'string'),
+                   ('Submit', 'timestamp'),
+                   ('Start', 'timestamp'),
+                   ('End', 'timestamp'),
+                   ('Account', 'string'),
+                   ('wait_time', 'int64'),
+                   ('timespan', 'int64'))
+
+
+class TSVSink:
+    """Tab-separated rows with a header line, on stdout by default."""
+
+    # parallel workers may hand over pre-formatted text
+    accepts_text = True
+    typed = False
+
+    def __init__(self, out: Optional[TextIO] = None):
+        self.out = out or sys.stdout
+
+    def start(self, extra_fields: Sequence[str] = ()):
+        print(*SEFF_TSV_COLUMNS, *extra_fields, sep="\t", file=self.out)
+
+    def write(self, row: Sequence[Any]):
+        self.out.write("\t".join(map(str, row)) + "\n")
+
+    def write_text(self, text: str):
+        self.out.write(text)
+
+    def close(self):
+        self.out.flush()
+
+
+# column affinities; everything not listed is TEXT
+SQLITE_TYPES = {
+    'NNodes': 'INTEGER',
+    'AllocCPUS': 'INTEGER',
+    'CPU_Efficiency': 'REAL',
+    'Elapsed_raw': 'REAL',
+    'MaxRSS_Utilized_raw': 'INTEGER',
+    'REQMEM': 'INTEGER',
+    'memory_efficiency': 'REAL',
+    'wait_time': 'INTEGER',
+    'timespan': 'INTEGER',
+}
+
+SQLITE_INDEXED_COLUMNS = ('User', 'Account', 'State', 'Submit')
+
+
+def _quote(name: str) -> str:
+    # Group, End etc. are SQL keywords
+    return '"' + name.replace('"', '""') + '"'
+
+
+class SQLiteSink:
+    """
+    Upsert rows into an SQLite table keyed on JobID.
+
+    Rows are inserted with executemany() in transactions of `batch_size` rows.
+    The table and its indexes on JobID, User, Account, State and Submit are
+    created on first use, and columns missing from an existing table are
+    added.  Re-running over overlapping input replaces the earlier row of a
+    job.
+    """
+
+    accepts_text = False
+    typed = False
+
+    def __init__(self, path: str, table: str = 'jobs', batch_size: int = 10000):
+        self.path = path
+        self.table = table
+        self.batch_size = batch_size
+        self.rows: List[Sequence[Any]] = []
+        self.conn = sqlite3.connect(path)
+        # bulk loading: the database is rebuilt from sacct if a crash corrupts it
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+
+    def start(self, extra_fields: Sequence[str] = ()):
+        columns = list(SEFF_TSV_COLUMNS) + list(extra_fields)
+        table = _quote(self.table)
+
+        definitions = [f"{_quote('JobID')} TEXT PRIMARY KEY"]
+        definitions += [f"{_quote(c)} {SQLITE_TYPES.get(c, 'TEXT')}" for c in columns[1:]]
+        with self.conn:
+            self.conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(definitions)})")
+
+            # extra columns of this input that an earlier run did not have
+            existing = {row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+            for column in columns:
+                if column not in existing:
+                    self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {_quote(column)} {SQLITE_TYPES.get(column, 'TEXT')}")
+
+            for column in SQLITE_INDEXED_COLUMNS:
+                index = _quote(f"{self.table}_{column}")
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS {index} ON {table} ({_quote(column)})")
+
+        # the TSV rows leave missing numbers (e.g. wait_time of a pending job)
+        # blank; stored as '' they would be TEXT and sort above every number
+        self._numeric = [i for i, c in enumerate(columns) if SQLITE_TYPES.get(c, 'TEXT') != 'TEXT']
+
+        names = ", ".join(_quote(c) for c in columns)
+        placeholders = ", ".join("?" * len(columns))
+        updates = ", ".join(f"{_quote(c)}=excluded.{_quote(c)}" for c in columns[1:])
+        self._insert = (f"INSERT INTO {table} ({names}) VALUES ({placeholders}) "
+                        f"ON CONFLICT({_quote('JobID')}) DO UPDATE SET {updates}")
+
+    def write(self, row: Sequence[Any]):
+        if any(row[i] == '' for i in self._numeric):
+            row = list(row)
+            for i in self._numeric:
+                if row[i] == '':
+                    row[i] = None
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        with self.conn:
+            self.conn.executemany(self._insert, self.rows)
+        self.rows = []
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+
+class ColumnarSink:
+    """
+    Write typed rows to a Parquet file or an Arrow IPC file (requires pyarrow).
+
+    Rows are buffered per column and written as a row group (Parquet) or a
+    record batch (Arrow) every `row_group_size` rows, so memory stays bounded
+    by one row group however long the input is.  `timestamp` columns accept
+    epoch seconds or sacct's YYYY-MM-DDTHH:MM:SS strings; Unknown and None
+    become nulls.
+    """
+
+    accepts_text = False
+    typed = True
+
+    FORMATS = ('parquet', 'arrow')
+
+    def __init__(self, path: str,
+                 schema: Sequence[Tuple[str, str]] = COLUMNAR_SCHEMA,
+                 file_format: str = 'parquet',
+                 row_group_size: int = 65536):
+        import pyarrow
+        import pyarrow.compute
+        self.pa = pyarrow
+        self.pc = pyarrow.compute
+
+        if file_format not in self.FORMATS:
+            raise ValueError(f"unknown columnar format {file_format!r}, expected one of {self.FORMATS}")
+
+        self.path = path
+        self.base_schema = list(schema)
+        self.file_format = file_format
+        self.row_group_size = row_group_size
+        self.writer = None
+
+    def start(self, extra_fields: Sequence[str] = ()):
+        pa = self.pa
+        types = {'string': pa.string(),
+                 'int64': pa.int64(),
+                 'float64': pa.float64(),
+                 'timestamp': pa.timestamp('s')}
+
+        self.columns = self.base_schema + [(field, 'string') for field in extra_fields]
+        self.schema = pa.schema([(name, types[kind]) for name, kind in self.columns])
+        self.buffers = [[] for _ in self.columns]
+        self.buffered = 0
+
+        if self.file_format == 'parquet':
+            import pyarrow.parquet
+            self.writer = pyarrow.parquet.ParquetWriter(self.path, self.schema)
+        else:
+            self.writer = pa.ipc.new_file(self.path, self.schema)
+
+    def write(self, row: Sequence[Any]):
+        for buffer, value in zip(self.buffers, row):
+            buffer.append(value)
+        self.buffered += 1
+        if self.buffered >= self.row_group_size:
+            self.flush()
+
+    def _array(self, values: List[Any], kind: str):
+        pa = self.pa
+        if kind == 'int64':
+            return pa.array([int(v) if v not in ('', None) else None for v in values], type=pa.int64())
+        if kind == 'float64':
+            return pa.array([float(v) if v not in ('', None) else None for v in values], type=pa.float64())
+        if kind == 'timestamp':
+            if all(isinstance(v, int) or v is None for v in values):
+                return pa.array(values, type=pa.timestamp('s'))
+            strings = pa.array([v if isinstance(v, str) else None for v in values], type=pa.string())
+            return self.pc.strptime(strings, format='%Y-%m-%dT%H:%M:%S', unit='s', error_is_null=True)
+        return pa.array([None if v is None else str(v) for v in values], type=pa.string())
+
+    def flush(self):
+        if not self.buffered:
+            return
+        arrays = [self._array(values, kind) for values, (name, kind) in zip(self.buffers, self.columns)]
+        batch = self.pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+        if self.file_format == 'parquet':
+            self.writer.write_batch(batch, row_group_size=self.row_group_size)
+        else:
+            self.writer.write_batch(batch)
+        self.buffers = [[] for _ in self.columns]
+        self.buffered = 0
+
+    def close(self):
+        self.flush()
+        self.writer.close()
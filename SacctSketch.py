@@ -0,0 +1,319 @@
+#!/usr/bin/env python
+"""
+Mergeable quantile sketches of job efficiency, wait and memory distributions.
+
+parse_sacct.py --sketch-by keeps one KLL sketch per metric and group while
+it streams, prints the requested quantiles and can save the sketches as
+JSON.  Saved sketches of different shards or days are combined with
+
+    SacctSketch.py merge -o month.json day1.json day2.json ...
+    SacctSketch.py show month.json --quantiles 0.5,0.9,0.99
+
+without rescanning the raw sacct data.
+"""
+import argparse
+import json
+import math
+import sys
+from math import nan
+from typing import Dict, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+from SacctRecord import JobRecord
+from SacctRollup import GROUP_METRICS, group_key
+
+SKETCH_METRICS = ('CPU_Efficiency', 'memory_efficiency', 'wait_time', 'MaxRSS_Utilized_raw')
+
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99)
+
+SKETCH_VERSION = 1
+
+
+class KLLSketch:
+    """
+    KLL quantile sketch (Karnin, Lang, Liberty 2016).
+
+    Values are buffered in a stack of compactors; a full compactor sorts
+    itself and promotes every other value to the next level, where each value
+    stands for twice as many inputs.  With the default k=200 the rank error is
+    around 1% while the sketch holds a few hundred values however many
+    were added.  Two sketches merge by concatenating their levels and
+    compacting again.  The minimum and maximum are kept exactly.
+    """
+
+    __slots__ = ('k', 'n', 'min', 'max', 'compactors', 'size', 'max_size', '_coin')
+
+    # each lower level holds c times the capacity of the one above it
+    C = 2 / 3
+
+    def __init__(self, k: int = 200):
+        self.k = k
+        self.n = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.compactors: List[List[float]] = []
+        self.size = 0
+        self.max_size = 0
+        # alternates which half of a compactor is kept, instead of a random coin,
+        # so that a sketch is reproducible from its input
+        self._coin = 0
+        self._grow()
+
+    def _grow(self):
+        self.compactors.append([])
+        self.max_size = sum(self._capacity(h) for h in range(len(self.compactors)))
+
+    def _capacity(self, height: int) -> int:
+        depth = len(self.compactors) - height - 1
+        return int(math.ceil(self.C ** depth * self.k)) + 1
+
+    def add(self, value: float):
+        if value != value:
+            # NaN efficiencies of zero-length jobs, waits of unstarted jobs
+            return
+        self.n += 1
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.compactors[0].append(value)
+        self.size += 1
+        if self.size >= self.max_size:
+            self._compress()
+
+    def _compress(self):
+        for height in range(len(self.compactors)):
+            compactor = self.compactors[height]
+            if len(compactor) < self._capacity(height):
+                continue
+            if height + 1 >= len(self.compactors):
+                self._grow()
+
+            compactor.sort()
+            # an odd value out stays behind
+            kept = [compactor.pop()] if len(compactor) % 2 else []
+            self._coin ^= 1
+            self.compactors[height + 1].extend(compactor[self._coin::2])
+            self.compactors[height] = kept
+
+            self.size = sum(len(c) for c in self.compactors)
+            if self.size < self.max_size:
+                break
+
+    def merge(self, other: "KLLSketch"):
+        """Add the values summarized by `other` to this sketch."""
+        if other.k != self.k:
+            # the error bound only holds for sketches of the same size
+            raise ValueError(f"cannot merge a sketch with k={other.k} into one with k={self.k}")
+        while len(self.compactors) < len(other.compactors):
+            self._grow()
+        for height, compactor in enumerate(other.compactors):
+            self.compactors[height].extend(compactor)
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.size = sum(len(c) for c in self.compactors)
+        while self.size >= self.max_size:
+            self._compress()
+
+    def quantiles(self, qs: Sequence[float]) -> List[float]:
+        """Approximate value at each rank fraction in `qs`; NaN for an empty sketch."""
+        if not self.n:
+            return [nan] * len(qs)
+
+        weighted = sorted((value, 1 << height)
+                          for height, compactor in enumerate(self.compactors)
+                          for value in compactor)
+        total = sum(weight for _, weight in weighted)
+
+        results = []
+        for q in qs:
+            if q <= 0:
+                results.append(self.min)
+                continue
+            if q >= 1:
+                results.append(self.max)
+                continue
+            target = q * total
+            cumulative = 0
+            for value, weight in weighted:
+                cumulative += weight
+                if cumulative >= target:
+                    results.append(value)
+                    break
+            else:
+                results.append(self.max)
+        return results
+
+    def to_dict(self) -> dict:
+        return {'k': self.k,
+                'n': self.n,
+                'min': self.min if self.n else None,
+                'max': self.max if self.n else None,
+                'compactors': self.compactors}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "KLLSketch":
+        sketch = cls(data['k'])
+        sketch.n = data['n']
+        if sketch.n:
+            sketch.min = data['min']
+            sketch.max = data['max']
+        sketch.compactors = [list(c) for c in data['compactors']] or [[]]
+        sketch.max_size = sum(sketch._capacity(h) for h in range(len(sketch.compactors)))
+        sketch.size = sum(len(c) for c in sketch.compactors)
+        return sketch
+
+
+class SketchRollup:
+    """
+    One KLL sketch per SKETCH_METRICS entry for each distinct value of the `keys` columns.
+
+    Used like the rollups of SacctRollup: start(), add() for every job, then
+    write() the quantile table and/or save() the sketches.
+    """
+
+    def __init__(self, keys: Sequence[str], k: int = 200,
+                 quantiles: Sequence[float] = DEFAULT_QUANTILES,
+                 metrics: Sequence[str] = SKETCH_METRICS):
+        self.keys = tuple(keys)
+        self.k = k
+        self.quantiles = tuple(quantiles)
+        self.metrics = tuple(metrics)
+        self.groups: Dict[tuple, List[KLLSketch]] = {}
+        self.counts: Dict[tuple, int] = {}
+        self._key = None
+        getters = dict(GROUP_METRICS)
+        self._getters = [getters[metric] for metric in self.metrics]
+
+    def start(self, extra_fields: Sequence[str] = ()):
+        self._key = group_key(self.keys, extra_fields)
+
+    def add(self, record: JobRecord) -> bool:
+        key = self._key(record)
+        sketches = self.groups.get(key)
+        if sketches is None:
+            self.groups[key] = sketches = [KLLSketch(self.k) for _ in self.metrics]
+            self.counts[key] = 0
+        self.counts[key] += 1
+        for sketch, metric in zip(sketches, self._getters):
+            sketch.add(metric(record))
+        return True
+
+    def merge(self, other: "SketchRollup"):
+        if other.keys != self.keys or other.metrics != self.metrics:
+            raise ValueError(f"cannot merge sketches by {','.join(other.keys)} of {','.join(other.metrics)} "
+                             f"into sketches by {','.join(self.keys)} of {','.join(self.metrics)}")
+        if other.k != self.k:
+            raise ValueError(f"cannot merge sketches with k={other.k} into sketches with k={self.k}; "
+                             f"use the same --sketch-k for every run")
+        for key, sketches in other.groups.items():
+            mine = self.groups.get(key)
+            if mine is None:
+                self.groups[key] = mine = [KLLSketch(self.k) for _ in self.metrics]
+                self.counts[key] = 0
+            self.counts[key] += other.counts[key]
+            for sketch, other_sketch in zip(mine, sketches):
+                sketch.merge(other_sketch)
+
+    def columns(self) -> List[str]:
+        columns = list(self.keys) + ['num_jobs']
+        for metric in self.metrics:
+            columns += [f"{metric}_p{_percent(q)}" for q in self.quantiles]
+        return columns
+
+    def rows(self) -> Iterator[list]:
+        for key, sketches in self.groups.items():
+            row = list(key) + [self.counts[key]]
+            for sketch in sketches:
+                row += sketch.quantiles(self.quantiles)
+            yield row
+
+    def write(self, out: TextIO):
+        print(*self.columns(), sep="\t", file=out)
+        for row in self.rows():
+            out.write("\t".join(map(str, row)) + "\n")
+
+    def to_dict(self) -> dict:
+        return {'version': SKETCH_VERSION,
+                'keys': self.keys,
+                'metrics': self.metrics,
+                'k': self.k,
+                'groups': [{'key': key,
+                            'num_jobs': self.counts[key],
+                            'sketches': [sketch.to_dict() for sketch in sketches]}
+                           for key, sketches in self.groups.items()]}
+
+    @classmethod
+    def from_dict(cls, data: dict, quantiles: Sequence[float] = DEFAULT_QUANTILES) -> "SketchRollup":
+        if data.get('version') != SKETCH_VERSION:
+            raise ValueError(f"unsupported sketch version {data.get('version')}")
+        rollup = cls(data['keys'], data['k'], quantiles, data['metrics'])
+        for group in data['groups']:
+            key = tuple(group['key'])
+            rollup.groups[key] = [KLLSketch.from_dict(sketch) for sketch in group['sketches']]
+            rollup.counts[key] = group['num_jobs']
+        return rollup
+
+    def save(self, path: str):
+        with open(path, 'w') as fh:
+            json.dump(self.to_dict(), fh)
+
+    @classmethod
+    def load(cls, path: str, quantiles: Sequence[float] = DEFAULT_QUANTILES) -> "SketchRollup":
+        with open(path) as fh:
+            return cls.from_dict(json.load(fh), quantiles)
+
+
+def _percent(q: float) -> str:
+    # 0.5 -> '50', 0.999 -> '99.9'
+    return f"{q * 100:g}"
+
+
+def parse_quantiles(value: str) -> Tuple[float, ...]:
+    quantiles = tuple(float(q) for q in value.split(',') if q.strip())
+    if not quantiles or any(not 0 <= q <= 1 for q in quantiles):
+        raise argparse.ArgumentTypeError(f"expected comma-separated fractions between 0 and 1, got {value!r}")
+    return quantiles
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Merge and query quantile sketches saved by parse_sacct.py --sketch-out.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    merge = commands.add_parser('merge', help="combine sketch files into one")
+    merge.add_argument('files', nargs='+')
+    merge.add_argument('--output', '-o', required=True, metavar='PATH')
+
+    show = commands.add_parser('show', help="print the quantiles of sketch files, merged, as TSV")
+    show.add_argument('files', nargs='+')
+    show.add_argument('--quantiles', type=parse_quantiles, default=DEFAULT_QUANTILES,
+                      help="comma-separated fractions (default: 0.5,0.9,0.99)")
+    return parser.parse_args(argv)
+
+
+def load_merged(paths: Sequence[str], quantiles: Sequence[float] = DEFAULT_QUANTILES) -> Optional[SketchRollup]:
+    merged = None
+    for path in paths:
+        rollup = SketchRollup.load(path, quantiles)
+        if merged is None:
+            merged = rollup
+        else:
+            merged.merge(rollup)
+    return merged
+
+
+def main():
+    args = parse_args()
+    try:
+        merged = load_merged(args.files, getattr(args, 'quantiles', DEFAULT_QUANTILES))
+    except ValueError as e:
+        sys.exit(str(e))
+
+    if args.command == 'merge':
+        merged.save(args.output)
+    else:
+        merged.write(sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
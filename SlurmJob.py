@@ -1,8 +1,7 @@
-from SlurmTres import TRESData
+from SlurmTres import TRESData, TRESStore
 from SlurmTime import TimeInfo
 from JobStep import JobStep
 from typing import Optional, List, Dict
-import json
 
 class SlurmJob:
     def __init__(self, job_id, 
@@ -16,7 +15,8 @@ class SlurmJob:
                  time, 
                  steps:List[JobStep],
                  submit_line: str,
-                 working_directory: str):
+                 working_directory: str,
+                 tres: Optional[TRESData] = None):
     
         self.job_id = job_id
         self.name = name
@@ -30,9 +30,17 @@ class SlurmJob:
         self.steps = steps
         self.submit_line = submit_line
         self.working_directory = working_directory
+        self.tres = tres  # job-level allocated and requested TRES
 
     @classmethod
-    def from_json(cls, data):
+    def from_json(cls, data, lazy: bool = False, keep_tres: bool = True, tres_store: Optional[TRESStore] = None):
+        """
+        A job and its steps.  The job's own TRES is always decoded, as
+        allocated_cpus() and allocated_memory() read it.  With lazy, the steps are
+        LazyJobSteps (see JobStep.py), which keep the allocation and peak memory
+        seff_stats() reads and decode their time, TRES and exit code on access;
+        keep_tres=False drops the steps' TRES beyond those numbers.
+        """
         job_id = data.get("job_id")
         name = data.get("name")
         nodes = data.get("nodes")
@@ -47,7 +55,7 @@ class SlurmJob:
         jobsteps_data = data["steps"]
         steps = []
         for jobstep_data in jobsteps_data:
-            jobstep = JobStep.from_json(jobstep_data)
+            jobstep = JobStep.from_json(jobstep_data, lazy=lazy, keep_tres=keep_tres, tres_store=tres_store)
             steps.append(jobstep)
         
 
@@ -71,14 +79,37 @@ class SlurmJob:
             time=time,
             steps = steps,
             submit_line = data['submit_line'],
-            working_directory = data['working_directory']
+            working_directory = data['working_directory'],
+            tres = tres
         )
 
 
+    def allocated_cpus(self) -> Optional[int]:
+        """CPUs allocated to the job, from its TRES, else the CPUs it required."""
+        item = self.tres.find_allocated("cpu") if self.tres and self.tres.allocated else None
+        if item is not None and item.count:
+            return item.count
+        return self.required.cpus if self.required else None
+
+    def allocated_memory(self) -> Optional[int]:
+        """Bytes of memory allocated to the job, from its TRES, else memory_per_cpu * CPUs."""
+        item = self.tres.find_allocated("mem") if self.tres and self.tres.allocated else None
+        if item is not None and item.count:
+            return item.count * 1024 ** 2  # MiB
+        cpus = self.allocated_cpus()
+        if self.required and self.required.memory_per_cpu and self.required.memory_per_cpu.set and cpus:
+            return self.required.memory_per_cpu.number * cpus * 1024 ** 2
+        return None
+
+    def peak_memory(self) -> Optional[int]:
+        """Largest peak memory (MaxRSS) in bytes over the steps, None without usage data."""
+        peaks = [peak for peak in map(_step_peak_memory, self.steps) if peak is not None]
+        return max(peaks) if peaks else None
+
     def seff_stats(self) -> Dict:
         """Compute seff-like statistics and return as a dictionary."""
         elapsed = self.time.elapsed if self.time else 0
-        cpus_requested = self.required.cpus if self.required else 0
+        cpus = self.allocated_cpus()
 
         # CPU time is (user + system)
         cpu_seconds = 0
@@ -90,22 +121,29 @@ class SlurmJob:
 
         # CPU efficiency: CPU time used divided by (CPUs * elapsed time)
         cpu_efficiency = None
-        if elapsed and cpus_requested:
-            cpu_efficiency = (cpu_seconds / (elapsed * cpus_requested)) * 100
+        if elapsed and cpus:
+            cpu_efficiency = (cpu_seconds / (elapsed * cpus)) * 100
 
-        # Memory efficiency: Unknown without memory used info
         # We can report requested memory per CPU
         mem_per_cpu_mb = None
         if self.required and self.required.memory_per_cpu:
             mem_per_cpu_mb = self.required.memory_per_cpu.number  # Assuming MB
 
+        # Memory efficiency: peak memory of the steps over the allocated memory
+        peak = self.peak_memory()
+        allocated = self.allocated_memory()
+        memory_efficiency = None
+        if peak is not None and allocated:
+            memory_efficiency = peak / allocated * 100
+
         return {
             "Job ID": self.job_id,
             "Elapsed Time (seconds)": elapsed,
             "CPU Time (seconds)": round(cpu_seconds, 3),
             "CPU Efficiency (%)": round(cpu_efficiency, 2) if cpu_efficiency is not None else None,
             "Memory Requested (per CPU)": f"{mem_per_cpu_mb} MB" if mem_per_cpu_mb is not None else None,
-            "Memory Efficiency (%)": "Unknown (no usage data)"  # we would need 'MaxRSS' or similar field
+            "Memory Utilized (bytes)": peak,
+            "Memory Efficiency (%)": round(memory_efficiency, 2) if memory_efficiency is not None else None
         }
 
     def __repr__(self) -> str:
@@ -116,6 +154,17 @@ class SlurmJob:
                 f" Working directory: {self.working_directory}\n" +
                 "\n".join(jobstep_parts))
 
+def _step_peak_memory(step) -> Optional[int]:
+    if hasattr(step, "max_mem"):
+        # LazyJobStep
+        return step.max_mem
+    if not step.tres:
+        return None
+    item = step.tres.find_requested_max("mem")
+    if item is None and step.tres.consumed:
+        item = step.tres.find("consumed", "mem", "max")
+    return item.count if item is not None else None
+
 class Priority:
     def __init__(self, data: Dict):
         self.set: bool = data.get("set", False)
@@ -152,10 +201,9 @@ class RequiredResources:
                 f"memory={self.memory}>")
 
 if __name__  == "__main__":
-    with open("sacct.json") as fh:
-        json_txt = fh.read()
+    # SacctJson imports this module
+    from SacctJson import SacctJsonReader
 
-    sacct_output = json.loads(json_txt)
-    for job in sacct_output['jobs']:
-        job = SlurmJob.from_json(job)
-        print(job)
+    with open("sacct.json") as fh:
+        for job in SacctJsonReader(fh):
+            print(job)
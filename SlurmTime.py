@@ -1,3 +1,5 @@
+import calendar
+from datetime import date, datetime
 from typing import Optional, Any, Dict
 
 class TimeLimit:
@@ -53,4 +55,40 @@ class TimeInfo:
             system =  TimeComponent(data["system"]),
             total =  TimeComponent(data["total"]),
             user = TimeComponent(data["user"])
-        )
\ No newline at end of file
+        )
+
+# epoch seconds of midnight for each YYYY-MM-DD seen; a dump spans few distinct days
+_DAY_EPOCHS: Dict[str, int] = {}
+_DAY_EPOCHS_MAX = 1 << 16
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+def parse_sacct_timestamp(value: Optional[str]) -> Optional[int]:
+    """
+    Epoch seconds of a sacct Submit/Start/End value like 2024-03-02T10:05:00.
+
+    The time is read as UTC, like ymd_hms(tz = "UTC") in usage.Rmd.  Unknown,
+    None and blank values give None.  Only the date prefix goes through the
+    calendar, once per day; the clock part is sliced out at fixed offsets.
+    """
+    if not value or len(value) != 19 or value[10] != 'T':
+        if not value or value in ("Unknown", "None"):
+            return None
+        try:
+            return calendar.timegm(datetime.fromisoformat(value).timetuple())
+        except ValueError:
+            return None
+
+    day = _DAY_EPOCHS.get(value[:10])
+    if day is None:
+        try:
+            day = (date(int(value[0:4]), int(value[5:7]), int(value[8:10])).toordinal() - _EPOCH_ORDINAL) * 86400
+        except ValueError:
+            return None
+        if len(_DAY_EPOCHS) >= _DAY_EPOCHS_MAX:
+            _DAY_EPOCHS.clear()
+        _DAY_EPOCHS[value[:10]] = day
+
+    try:
+        return day + int(value[11:13]) * 3600 + int(value[14:16]) * 60 + int(value[17:19])
+    except ValueError:
+        return None
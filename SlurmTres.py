@@ -1,6 +1,36 @@
-from typing import List, Dict, Optional
+from array import array
+from typing import List, Dict, Optional, Sequence, Tuple
 from dataclasses import dataclass
 
+# the TRES an efficiency calculation usually wants, as "type" or "type/name"
+EFFICIENCY_TRES = ("cpu", "mem", "node", "billing", "gres/gpu")
+
+def tres_count(items: Optional[List[dict]], resource_type: str) -> Optional[int]:
+    """Count of the first entry of `resource_type` in a raw JSON TRES list."""
+    for item in items or ():
+        if item.get("type") == resource_type:
+            return item.get("count")
+    return None
+
+
+def allocated_items(tres: dict) -> Optional[List[dict]]:
+    """The raw allocated TRES list of a job's or step's `tres` dict."""
+    allocated = tres.get("allocated")
+    if isinstance(allocated, dict):
+        allocated = allocated.get("total")
+    return allocated
+
+
+def peak_memory(tres: dict) -> Optional[int]:
+    """Peak memory in bytes (sacct's MaxRSS) of a step's raw `tres` dict."""
+    # sacct's json output has the per-task peaks under requested.max even
+    # though they are usage; fall back to consumed.max when it is not there
+    peak = tres_count((tres.get("requested") or {}).get("max"), "mem")
+    if peak is None:
+        peak = tres_count((tres.get("consumed") or {}).get("max"), "mem")
+    return peak
+
+
 @dataclass
 class TRESItem:
     type: str
@@ -44,27 +74,46 @@ class TRESData:
         self.requested = requested
         self.consumed = consumed
         self.allocated = allocated
+        self._index = self._build_index()
+
+    def _build_index(self) -> Dict[Tuple[str, str, str, Optional[str]], TRESItem]:
+        """(category, summary, type, name) -> item, plus name None for the first item of each type."""
+        index = {}
+        for category, summaries in (('requested', self.requested),
+                                    ('consumed', self.consumed),
+                                    ('allocated', self.allocated)):
+            for summary, items in (summaries or {}).items():
+                for item in items:
+                    index.setdefault((category, summary, item.type, item.name), item)
+                    index.setdefault((category, summary, item.type, None), item)
+        return index
+
+    def find(self, category: str, resource: str, summary: str = "total") -> Optional[TRESItem]:
+        """The item of `resource` ("cpu", "mem", "gres/gpu"...) in a category and summary."""
+        resource_type, _, name = resource.partition('/')
+        return self._index.get((category, summary, resource_type, name or None))
+
+    def counts(self, wanted: Sequence[Tuple[str, str, str]]) -> List[Optional[int]]:
+        """The counts of (category, summary, resource) triples in one call, None where absent."""
+        get = self._index.get
+        counts = []
+        for category, summary, resource in wanted:
+            resource_type, _, name = resource.partition('/')
+            item = get((category, summary, resource_type, name or None))
+            counts.append(item.count if item is not None else None)
+        return counts
 
     def find_allocated(self, resource_type: str, summary_type = "total") -> Optional[TRESItem]:
         """Find an allocated resource by type (e.g., 'cpu', 'mem', 'node')."""
-        for item in self.allocated[summary_type]:
-            if item.type == resource_type:
-                return item 
-        return None
+        return self._index.get(('allocated', summary_type, resource_type, None))
 
     def find_requested_max(self, resource_type: str) -> Optional[TRESItem]:
         """Find requested max resource by type."""
-        for item in self.requested.get('max', []):
-            if item.type == resource_type:
-                return item
-        return None
+        return self._index.get(('requested', 'max', resource_type, None))
 
     def find_consumed_total(self, resource_type: str) -> Optional[TRESItem]:
         """Find consumed total resource by type."""
-        for item in self.consumed.get('total', []):
-            if item.type == resource_type:
-                return item
-        return None
+        return self._index.get(('consumed', 'total', resource_type, None))
 
     def __repr__(self):
         return f"TRESData(allocated={self.allocated})"
@@ -84,7 +133,7 @@ class TRESData:
                         tresitemlist = data[category][summ]
                         tres_items = [ TRESItem.from_json(j) for j in tresitemlist ]
                         cat_dict[summ] = tres_items
-                    elif category == 'allocated' and type(data[category] == type([])):                
+                    elif category == 'allocated' and isinstance(data[category], list):
                         cat_dict['total'] = [ TRESItem.from_json(j) for j in data[category] ]
 
                 tres_data[category] = cat_dict
@@ -99,3 +148,185 @@ class TRESData:
         )
 
 
+
+
+# row codes of TRESStore
+TRES_CATEGORIES = ('requested', 'consumed', 'allocated')
+TRES_SUMMARIES = ('max', 'min', 'average', 'total')
+
+# stands for a missing count/id/task in the int64 columns
+_MISSING = -(1 << 63)
+
+
+class TRESStore:
+    """
+    Columnar storage for the TRES of many steps.
+
+    Every TRES entry of every step added is one row of typed arrays (step
+    index, category, summary, type, name, count, plus id, task and node), with
+    the type, name and node strings kept once in dictionaries.  add() returns a
+    StoredTRES for the step, which answers the TRESData lookups from the rows
+    and creates TRESItem objects only when asked for them.  One store is meant
+    to be shared by all the steps of a load, e.g.
+
+        store = TRESStore()
+        jobs = SacctJsonReader(fh, tres_store=store)
+    """
+
+    def __init__(self):
+        self.step = array('I')
+        self.category = array('B')
+        self.summary = array('B')
+        self.type = array('I')
+        self.name = array('I')
+        self.count = array('q')
+        self.id = array('q')
+        self.task = array('q')
+        self.node = array('I')
+        # string dictionaries; id 0 is the empty string
+        self.strings: List[str] = ['']
+        self._string_ids: Dict[str, int] = {'': 0}
+        self.steps = 0
+
+    def __len__(self) -> int:
+        return len(self.count)
+
+    def string_id(self, value: Optional[str]) -> int:
+        value = value or ''
+        string_id = self._string_ids.get(value)
+        if string_id is None:
+            string_id = self._string_ids[value] = len(self.strings)
+            self.strings.append(value)
+        return string_id
+
+    def add(self, data: dict) -> "StoredTRES":
+        """Append the rows of one step's `tres` dict."""
+        step = self.steps
+        self.steps += 1
+        start = len(self.count)
+        for category_code, category in enumerate(TRES_CATEGORIES):
+            summaries = data.get(category)
+            if summaries is None:
+                continue
+            if isinstance(summaries, list):
+                # allocated is a plain list, stored as its total
+                self._add_items(step, category_code, TRES_SUMMARIES.index('total'), summaries)
+                continue
+            for summary_code, summary in enumerate(TRES_SUMMARIES):
+                if summary in summaries:
+                    self._add_items(step, category_code, summary_code, summaries[summary])
+        return StoredTRES(self, start, len(self.count))
+
+    def _add_items(self, step: int, category: int, summary: int, items: List[dict]):
+        string_id = self.string_id
+        for item in items:
+            self.step.append(step)
+            self.category.append(category)
+            self.summary.append(summary)
+            self.type.append(string_id(item.get("type")))
+            self.name.append(string_id(item.get("name")))
+            self.count.append(_int_or_missing(item.get("count")))
+            self.id.append(_int_or_missing(item.get("id")))
+            self.task.append(_int_or_missing(item.get("task")))
+            self.node.append(string_id(item.get("node")))
+
+    def item(self, row: int) -> TRESItem:
+        """A TRESItem for one row."""
+        strings = self.strings
+        node = self.node[row]
+        return TRESItem(type=strings[self.type[row]],
+                        name=strings[self.name[row]],
+                        id=_value_or_none(self.id[row]),
+                        count=_value_or_none(self.count[row]),
+                        task=_value_or_none(self.task[row]),
+                        node=strings[node] if node else None)
+
+    def nbytes(self) -> int:
+        """Size of the columns, without the string dictionaries."""
+        return sum(column.itemsize * len(column) for column in
+                   (self.step, self.category, self.summary, self.type, self.name,
+                    self.count, self.id, self.task, self.node))
+
+
+def _int_or_missing(value: Optional[int]) -> int:
+    return _MISSING if value is None else value
+
+
+def _value_or_none(value: int) -> Optional[int]:
+    return None if value == _MISSING else value
+
+
+class StoredTRES:
+    """The TRESData interface over one step's rows of a TRESStore."""
+
+    __slots__ = ('store', 'start', 'end')
+
+    def __init__(self, store: TRESStore, start: int, end: int):
+        self.store = store
+        self.start = start
+        self.end = end
+
+    def _row(self, category: str, summary: str, resource: str) -> Optional[int]:
+        store = self.store
+        resource_type, _, name = resource.partition('/')
+        type_id = store._string_ids.get(resource_type)
+        name_id = store._string_ids.get(name) if name else None
+        if type_id is None or (name and name_id is None):
+            return None
+        category_code = TRES_CATEGORIES.index(category)
+        summary_code = TRES_SUMMARIES.index(summary)
+        # a step has a few dozen rows, so a scan of its range of the typed columns
+        for row in range(self.start, self.end):
+            if (store.type[row] == type_id and store.summary[row] == summary_code
+                    and store.category[row] == category_code
+                    and (name_id is None or store.name[row] == name_id)):
+                return row
+        return None
+
+    def find(self, category: str, resource: str, summary: str = "total") -> Optional[TRESItem]:
+        row = self._row(category, summary, resource)
+        return self.store.item(row) if row is not None else None
+
+    def counts(self, wanted: Sequence[Tuple[str, str, str]]) -> List[Optional[int]]:
+        counts = []
+        for category, summary, resource in wanted:
+            row = self._row(category, summary, resource)
+            counts.append(_value_or_none(self.store.count[row]) if row is not None else None)
+        return counts
+
+    def find_allocated(self, resource_type: str, summary_type = "total") -> Optional[TRESItem]:
+        return self.find('allocated', resource_type, summary_type)
+
+    def find_requested_max(self, resource_type: str) -> Optional[TRESItem]:
+        return self.find('requested', resource_type, 'max')
+
+    def find_consumed_total(self, resource_type: str) -> Optional[TRESItem]:
+        return self.find('consumed', resource_type, 'total')
+
+    def _category(self, category: str) -> Optional[Dict[str, List[TRESItem]]]:
+        store = self.store
+        category_code = TRES_CATEGORIES.index(category)
+        items = {}
+        for row in range(self.start, self.end):
+            if store.category[row] == category_code:
+                items.setdefault(TRES_SUMMARIES[store.summary[row]], []).append(store.item(row))
+        return items or None
+
+    @property
+    def requested(self) -> Optional[Dict[str, List[TRESItem]]]:
+        return self._category('requested')
+
+    @property
+    def consumed(self) -> Optional[Dict[str, List[TRESItem]]]:
+        return self._category('consumed')
+
+    @property
+    def allocated(self) -> Optional[Dict[str, List[TRESItem]]]:
+        return self._category('allocated')
+
+    def to_tres_data(self) -> TRESData:
+        """A standalone TRESData with TRESItem objects for every row."""
+        return TRESData(requested=self.requested, consumed=self.consumed, allocated=self.allocated)
+
+    def __repr__(self):
+        return f"StoredTRES(rows={self.end - self.start}, allocated={self.allocated})"
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+"""
+Benchmark the stages of the parse_sacct.py pipeline on synthetic or real sacct output.
+
+Each stage runs on the complete output of the previous one, with the
+conversion caches cleared before every repeat, and reports the best time:
+
+    parse        parse_sacct_lines(): split, decode and group the lines
+    aggregate    aggregate_sacct_rows() over every step group
+    efficiency   calculate_efficiencies() over every job
+    tsv          TSV rows written to an in-memory buffer
+    batch        the NumPy batch engine for aggregate + efficiency (if numpy is installed)
+    end-to-end   parse through TSV output in one streaming pass
+
+Peak RSS is the process high-water mark after each stage, so a stage only
+shows up there when it needs more memory than every stage before it.
+Results can be saved with --json and compared with a later run with --compare.
+"""
+import argparse
+import io
+import json
+import resource
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+import parse_sacct
+from generate_sacct import generate_lines
+from SacctDecoder import SacctDecoder, clear_conversion_caches
+from SacctSinks import TSVSink
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def time_stage(fn: Callable[[], object], repeat: int):
+    """Best wall time of `repeat` runs of fn() and the result of the last run."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        clear_conversion_caches()
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run_benchmarks(lines: List[str], repeat: int = 3, batch_size: int = 4096) -> Dict[str, Dict[str, float]]:
+    results = {}
+
+    def record(stage: str, seconds: float, items: int, unit: str):
+        results[stage] = {'seconds': seconds,
+                          'items': items,
+                          'unit': unit,
+                          'per_second': items / seconds if seconds else 0.0,
+                          'peak_rss_mb': peak_rss_mb()}
+
+    seconds, groups = time_stage(lambda: list(parse_sacct.parse_sacct_lines(lines, SacctDecoder.from_format())), repeat)
+    record('parse', seconds, len(lines), 'rows')
+
+    seconds, records = time_stage(lambda: [parse_sacct.aggregate_sacct_rows(steps) for _, steps in groups], repeat)
+    record('aggregate', seconds, len(groups), 'jobs')
+
+    seconds, records = time_stage(lambda: [parse_sacct.calculate_efficiencies(r) for r in records], repeat)
+    record('efficiency', seconds, len(records), 'jobs')
+
+    def write_tsv():
+        sink = TSVSink(io.StringIO())
+        sink.start()
+        for r in records:
+            sink.write(parse_sacct.seff_output_tsv_row(r))
+        return sink.out.tell()
+    seconds, _ = time_stage(write_tsv, repeat)
+    record('tsv', seconds, len(records), 'jobs')
+
+    try:
+        from SacctBatch import process_batches
+    except ImportError:
+        pass
+    else:
+        seconds, _ = time_stage(lambda: sum(1 for _ in process_batches(groups, batch_size, parse_sacct.summarize_top_level)), repeat)
+        record('batch', seconds, len(groups), 'jobs')
+
+    del groups, records
+
+    def end_to_end():
+        decoder = SacctDecoder.from_format()
+        parse_sacct.write_output(parse_sacct.parse_sacct_lines(lines, decoder), decoder, TSVSink(io.StringIO()))
+    seconds, _ = time_stage(end_to_end, repeat)
+    record('end-to-end', seconds, len(lines), 'rows')
+
+    return results
+
+
+def print_results(results: Dict[str, Dict[str, float]], baseline: Optional[Dict[str, Dict[str, float]]] = None):
+    header = ["stage", "seconds", "items", "per_second", "peak_rss_mb"]
+    if baseline:
+        header.append("speedup")
+    print(*header, sep="\t")
+    for stage, r in results.items():
+        row = [stage, f"{r['seconds']:.4f}", f"{r['items']} {r['unit']}", f"{r['per_second']:.0f}", f"{r['peak_rss_mb']:.1f}"]
+        if baseline:
+            old = baseline.get(stage)
+            row.append(f"{old['seconds'] / r['seconds']:.2f}x" if old and r['seconds'] else "")
+        print(*row, sep="\t")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Time the parse_sacct.py pipeline stage by stage.")
+    parser.add_argument('--jobs', '-n', type=int, default=100000, metavar='N',
+                        help="number of synthetic jobs to generate (default: %(default)s)")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="generator seed (default: %(default)s)")
+    parser.add_argument('--style', choices=('alpine', 'riviera', 'mixed'), default='mixed',
+                        help="generator record style (default: %(default)s)")
+    parser.add_argument('--file', metavar='PATH',
+                        help="benchmark an 18 column sacct -P dump instead of synthetic data")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="runs per stage; the best is reported (default: %(default)s)")
+    parser.add_argument('--batch-size', type=int, default=4096, metavar='N',
+                        help="jobs per block for the NumPy batch stage (default: %(default)s)")
+    parser.add_argument('--json', metavar='PATH',
+                        help="also save the results as JSON")
+    parser.add_argument('--compare', metavar='PATH',
+                        help="show the speedup over results saved earlier with --json")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    if args.file:
+        with open(args.file) as fh:
+            lines = fh.readlines()
+    else:
+        lines = list(generate_lines(args.jobs, args.seed, args.style))
+    print(f"{len(lines)} lines, peak RSS after loading {peak_rss_mb():.1f} MB", file=sys.stderr)
+
+    results = run_benchmarks(lines, args.repeat, args.batch_size)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)['stages']
+    print_results(results, baseline)
+
+    if args.json:
+        with open(args.json, 'w') as fh:
+            json.dump({'lines': len(lines),
+                       'source': args.file or f"generate_sacct {args.jobs} --seed {args.seed} --style {args.style}",
+                       'repeat': args.repeat,
+                       'stages': results}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+"""
+Generate synthetic `sacct -P -n` output for testing and benchmarking parse_sacct.py.
+
+Jobs are written one at a time, so any number of them can be produced in
+constant memory.  The mix covers alpine-style records (user@colostate.edu,
+`.extern`/`.batch`/`.0` steps, per-CPU REQMEM) and riviera-style records
+(cluster `slurm`, `.batch` only, multi-day `D-HH:MM:SS` times), array jobs with
+their `_N` tasks and pending `_[a-b%c]` records, and `CANCELLED by N` states.
+"""
+import argparse
+import random
+import sys
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from SacctDecoder import DEFAULT_FORMAT, parse_format
+
+# (state, weight) of finished jobs
+FINAL_STATES = (("COMPLETED", 60),
+                ("FAILED", 12),
+                ("TIMEOUT", 10),
+                ("CANCELLED", 10),
+                ("OUT_OF_MEMORY", 4),
+                ("RUNNING", 3),
+                ("PENDING", 1))
+
+EXIT_CODES = {"COMPLETED": "0:0",
+              "FAILED": "1:0",
+              "TIMEOUT": "0:0",
+              "CANCELLED": "0:0",
+              "OUT_OF_MEMORY": "0:125",
+              "RUNNING": "0:0",
+              "PENDING": "0:0"}
+
+ALPINE_JOB_NAMES = ("acompile", "sinteractive", "sys/dashboard/sys/jupyter_session",
+                    "conda-create", "create-cutrun", "sleep_10", "converge", "array")
+
+PARTITIONS = ("amilan", "ami100", "aa100", "amem", "atesting")
+
+QOS = ("normal", "long", "mem", "testing")
+
+# share of jobs that are array jobs, and their task count range
+ARRAY_FRACTION = 0.03
+ARRAY_TASKS = (2, 200)
+
+SACCT_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+def format_elapsed(seconds: int) -> str:
+    """[D-]HH:MM:SS as sacct prints Elapsed."""
+    days, seconds = divmod(int(seconds), 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    day_str = f"{days}-" if days else ""
+    return f"{day_str}{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+def format_cpu(seconds: float) -> str:
+    """[D-][HH:]MM:SS.mmm as sacct prints TotalCPU."""
+    whole = int(seconds)
+    millis = int(round((seconds - whole) * 1000)) % 1000
+    days, whole = divmod(whole, 86400)
+    hours, whole = divmod(whole, 3600)
+    minutes, whole = divmod(whole, 60)
+    if days:
+        return f"{days}-{hours:02d}:{minutes:02d}:{whole:02d}"
+    if hours:
+        return f"{hours:02d}:{minutes:02d}:{whole:02d}"
+    return f"{minutes:02d}:{whole:02d}.{millis:03d}"
+
+
+class SacctGenerator:
+    """Random sacct rows as dicts keyed by column name; see generate_lines()."""
+
+    def __init__(self, seed: Optional[int] = None, style: str = 'mixed',
+                 start: datetime = datetime(2024, 3, 1), users: int = 200):
+        self.rng = random.Random(seed)
+        self.style = style
+        self.clock = start
+        self.next_id = 6000000
+        self.users = users
+        self._states = [state for state, _ in FINAL_STATES]
+        self._weights = [weight for _, weight in FINAL_STATES]
+
+    def jobs(self, n_jobs: int) -> Iterator[List[Dict[str, str]]]:
+        """Step groups (top-level row first) of `n_jobs` jobs; an array task counts as one job."""
+        produced = 0
+        while produced < n_jobs:
+            riviera = self.style == 'riviera' or (self.style == 'mixed' and self.rng.random() < 0.2)
+            job_id = str(self.next_id)
+            self.next_id += self.rng.randint(1, 3)
+            # jobs are submitted a few seconds apart
+            self.clock += timedelta(seconds=self.rng.randint(0, 30))
+
+            if self.rng.random() < ARRAY_FRACTION:
+                n_tasks = min(self.rng.randint(*ARRAY_TASKS), n_jobs - produced)
+                yield from self._array(job_id, n_tasks, riviera)
+                produced += n_tasks
+            else:
+                yield self._job(job_id, riviera)
+                produced += 1
+
+    def _array(self, array_id: str, n_tasks: int, riviera: bool) -> Iterator[List[Dict[str, str]]]:
+        # the last tasks of some arrays are still pending and reported as one record
+        pending = self.rng.randint(1, n_tasks - 1) if n_tasks > 2 and self.rng.random() < 0.2 else 0
+        user_n = self.rng.randrange(self.users)
+        for task in range(1, n_tasks - pending + 1):
+            yield self._job(f"{array_id}_{task}", riviera, job_name="array", user_n=user_n)
+        if pending:
+            first = n_tasks - pending + 1
+            spec = f"[{first}-{n_tasks}%{self.rng.randint(1, 20)}]" if pending > 1 else f"[{first}]"
+            yield self._job(f"{array_id}_{spec}", riviera, job_name="array", state="PENDING", user_n=user_n)
+
+    def _job(self, job_id: str, riviera: bool, job_name: Optional[str] = None,
+             state: Optional[str] = None, user_n: Optional[int] = None) -> List[Dict[str, str]]:
+        rng = self.rng
+        state = state or rng.choices(self._states, self._weights)[0]
+        if user_n is None:
+            user_n = rng.randrange(self.users)
+
+        if riviera:
+            cluster = "slurm"
+            user = group = f"user{user_n}"
+            alloc_cpus = rng.choice((1, 4, 16, 32, 64, 128))
+            req_mem = rng.choice((f"{alloc_cpus * 4}G", f"{rng.randint(1000, 500000)}M"))
+            elapsed = int(rng.expovariate(1 / 20000))
+            account = ""
+            job_name = job_name or "run"
+            step_names = ("batch",)
+        else:
+            cluster = "alpine"
+            user = f"user{user_n}@colostate.edu"
+            group = f"user{user_n}pgrp@colostate.edu"
+            alloc_cpus = rng.choice((1, 1, 1, 2, 4, 8, 12, 20, 64))
+            req_mem = f"{alloc_cpus * 3840}M"
+            elapsed = int(rng.expovariate(1 / 3000))
+            account = f"acct{user_n % 7}"
+            job_name = job_name or rng.choice(ALPINE_JOB_NAMES)
+            step_names = ("extern", "0") if job_name == "acompile" else ("batch", "extern")
+
+        if state == "TIMEOUT":
+            elapsed = rng.choice((3600, 7200, 43200, 86400, 172800))
+        if state == "CANCELLED":
+            state = f"CANCELLED by {rng.randint(1000, 2000999)}"
+
+        submit = self.clock
+        wait = int(rng.expovariate(1 / 300))
+        start = submit + timedelta(seconds=wait)
+        end = start + timedelta(seconds=elapsed)
+        submit_str = submit.strftime(SACCT_TIME_FORMAT)
+        start_str = start.strftime(SACCT_TIME_FORMAT)
+        end_str = end.strftime(SACCT_TIME_FORMAT)
+        if state == "PENDING":
+            elapsed = 0
+            start_str = end_str = "Unknown"
+        elif state == "RUNNING":
+            end_str = "Unknown"
+
+        partition = rng.choice(PARTITIONS)
+        qos = rng.choice(QOS)
+        exit_code = EXIT_CODES.get(state.split(' ', 1)[0], "0:0")
+        total_cpu = elapsed * alloc_cpus * rng.betavariate(1.2, 3)
+
+        top = {"JobID": job_id, "User": user, "Group": group, "State": state, "Cluster": cluster,
+               "AllocCPUS": str(alloc_cpus), "REQMEM": req_mem, "TotalCPU": format_cpu(total_cpu),
+               "Elapsed": format_elapsed(elapsed), "MaxRSS": "", "ExitCode": exit_code, "NNodes": "1",
+               "NTasks": "", "JobName": job_name, "Submit": submit_str, "Start": start_str, "End": end_str,
+               "Account": account, "Partition": partition, "QOS": qos}
+        rows = [top]
+        if state == "PENDING":
+            return rows
+
+        req_bytes_k = alloc_cpus * 3840 * 1024
+        for name in step_names:
+            extern = name == "extern"
+            step_cpu = 0.001 if extern else total_cpu
+            max_rss = 0 if extern else int(req_bytes_k * rng.betavariate(1, 6))
+            step_state = "COMPLETED" if extern else ("CANCELLED" if state.startswith("CANCELLED") else state)
+            rows.append({"JobID": f"{job_id}.{name}", "User": "", "Group": "", "State": step_state,
+                         "Cluster": cluster, "AllocCPUS": str(alloc_cpus), "REQMEM": "",
+                         "TotalCPU": format_cpu(step_cpu), "Elapsed": format_elapsed(elapsed),
+                         "MaxRSS": f"{max_rss}K" if max_rss else "0", "ExitCode": "0:0" if extern else exit_code,
+                         "NNodes": "1", "NTasks": "1", "JobName": "extern" if extern else ("bash" if name == "0" else "batch"),
+                         "Submit": submit_str, "Start": start_str, "End": end_str, "Account": "",
+                         "Partition": partition, "QOS": qos})
+        return rows
+
+
+def generate_lines(n_jobs: int, seed: Optional[int] = None, style: str = 'mixed',
+                   columns: Sequence[str] = parse_format(DEFAULT_FORMAT), header: bool = False) -> Iterator[str]:
+    """`sacct -P` lines for `n_jobs` jobs with the given columns."""
+    if header:
+        yield "|".join(columns) + "\n"
+    for steps in SacctGenerator(seed, style).jobs(n_jobs):
+        for row in steps:
+            yield "|".join([row.get(column, "") for column in columns]) + "\n"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Write synthetic `sacct -P -n` output.")
+    parser.add_argument('n_jobs', type=int,
+                        help="number of jobs (array tasks count individually)")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="random seed; the same seed gives the same output (default: %(default)s)")
+    parser.add_argument('--style', choices=('alpine', 'riviera', 'mixed'), default='mixed',
+                        help="cluster style of the records (default: %(default)s)")
+    parser.add_argument('--format', default=DEFAULT_FORMAT,
+                        help="sacct --format column list to write; Partition and QOS are also generated "
+                             "(default: %(default)s)")
+    parser.add_argument('--header', action='store_true',
+                        help="start with a JobID|... header line as `sacct -P` without -n prints")
+    parser.add_argument('--output', '-o', metavar='PATH',
+                        help="write to PATH instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    lines = generate_lines(args.n_jobs, args.seed, args.style, parse_format(args.format), args.header)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            fh.writelines(lines)
+    else:
+        sys.stdout.writelines(lines)
+
+
+if __name__ == "__main__":
+    main()
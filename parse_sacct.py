@@ -1,19 +1,32 @@
 #!/usr/bin/env python
+import argparse
+import itertools
+import shlex
 import subprocess
 import sys
 from typing import Optional, List
 
-from numbers import Number
 from math import nan
 
 from typing import List, Dict, Any
-from collections import defaultdict
-
-def aggregate_sacct_rows(steps: List[Dict[str, Any]]) -> Dict[str, Any]:
-    summary:dict = defaultdict(lambda: None)
-
+from contextlib import ExitStack, contextmanager
+
+from SacctFilter import FilterError, RowFilter
+from SacctDecoder import SacctDecoder, SACCT_FIELDS, DEFAULT_FORMAT, is_header, job_id_prefix, parse_format
+from SacctDecoder import conversion_cache_stats, convert_to_bytes, parse_time, seconds_to_timeformat
+from SacctGrouping import group_unsorted_lines
+from SacctProfile import Profiler
+from SacctFetch import SHARD_SIZES, fetch_sharded_lines, sacct_command
+from SacctCheckpoint import Checkpoint
+from SacctRecord import JobRecord
+from SlurmTime import parse_sacct_timestamp
+from SacctRollup import ArrayRollup, GroupRollup
+from SacctSketch import DEFAULT_QUANTILES, SketchRollup, parse_quantiles
+from SacctSinks import SEFF_TSV_COLUMNS, ColumnarSink, SQLiteSink, TSVSink
+
+def find_top_level(steps: List[Any]) -> Optional[Any]:
     # Find top-level job (no "." in JobID)
-    top_level = next((step for step in steps if '.' not in step['JobID']), None)
+    top_level = next((step for step in steps if '.' not in step.JobID), None)
     
     # motivated by edge case which has both:
     # 1) a single step AND
@@ -21,56 +34,76 @@ def aggregate_sacct_rows(steps: List[Dict[str, Any]]) -> Dict[str, Any]:
     if len(steps) == 1:
         top_level = steps[0]
 
+    return top_level
+
+def summarize_top_level(steps: List[Any]) -> JobRecord:
+    """Copy the descriptive fields of the top-level row and collect the step names."""
+    top_level = find_top_level(steps)
 
     if top_level:
         # Take directly from top-level step
-        for field in ["JobID", 
-                      "AllocCPUS", 
-                      "REQMEM", 
-                      "Elapsed", 
-                      "NTasks",
-                        "NNodes", 
-                        "User", 
-                        "Group", 
-                        "State",
-                        "Cluster", 
-                        "ExitCode",
-                        "Submit",
-                        "Start",
-                        "End",
-                        "Account"]:
-            summary[field] = top_level.get(field)
+        record = JobRecord(JobID=top_level.JobID,
+                           User=top_level.User,
+                           Group=top_level.Group,
+                           State=top_level.State,
+                           Cluster=top_level.Cluster,
+                           ExitCode=top_level.ExitCode,
+                           NNodes=top_level.NNodes,
+                           NTasks=top_level.NTasks,
+                           AllocCPUS=top_level.AllocCPUS,
+                           REQMEM=top_level.REQMEM,
+                           Submit=top_level.Submit,
+                           Start=top_level.Start,
+                           End=top_level.End,
+                           Account=top_level.Account,
+                           extra=top_level[len(SACCT_FIELDS):])
+    else:
+        record = JobRecord(extra=(None,) * (len(steps[0]) - len(SACCT_FIELDS)))
+
+    jobnames = []
+    for step in steps[1:]:
+        if step.JobName:
+            jobnames.append(step.JobName)
+        if record.REQMEM is None and step.REQMEM:
+            record.REQMEM = step.REQMEM
+
+    if top_level and top_level.JobName:
+        jobnames.insert(0, top_level.JobName)
+    record.JobNames = ",".join(jobnames)
+
+    # the only conversions of the top-level strings
+    record.alloc_cpus = int(record.AllocCPUS or 0)
+    record.req_mem = convert_to_bytes(record.REQMEM) if record.REQMEM else 0
+    record.submit_time = parse_sacct_timestamp(record.Submit)
+    record.start_time = parse_sacct_timestamp(record.Start)
+    record.end_time = parse_sacct_timestamp(record.End)
+
+    return record
+
+def aggregate_sacct_rows(steps: List[Any]) -> JobRecord:
+    record = summarize_top_level(steps)
 
     # Aggregated fields
     total_cpu = 0.0
     elapsed = 0.0
     max_rss = 0
-    jobnames = []
 
     for step in steps[1:]:
-        if step.get("TotalCPU"):
-            total_cpu += parse_time(step["TotalCPU"])
-        if step.get("Elapsed"):
-            elapsed =  max(elapsed, parse_time(step["Elapsed"]))
-        if step.get("MaxRSS"):
-            mem = convert_to_bytes(step["MaxRSS"])
+        if step.TotalCPU:
+            total_cpu += parse_time(step.TotalCPU)
+        if step.Elapsed:
+            elapsed =  max(elapsed, parse_time(step.Elapsed))
+        if step.MaxRSS:
+            mem = convert_to_bytes(step.MaxRSS)
             if mem is not None:
                 max_rss = max(max_rss, mem)
-        if step.get("JobName"):
-            jobnames.append(step["JobName"])
-        if 'REQMEM' not in summary and step.get('REQMEM'):
-            summary["REQMEM"] = step.get("REQMEM")
-            
-
-    summary["TotalCPU"] = total_cpu
-    summary["Elapsed"] = seconds_to_timeformat(int(elapsed))
-    summary["MaxRSS"] = max_rss
 
-    if top_level and top_level.get('JobName'):
-        jobnames.insert(0, top_level['JobName'])
-    summary["JobNames"] = ",".join(jobnames)
+    record.total_cpu = total_cpu
+    # reported in whole seconds
+    record.elapsed = float(int(elapsed))
+    record.max_rss = max_rss
 
-    return dict(summary)
+    return record
 
 
 def format_size(bytes:int) -> str:
@@ -86,48 +119,321 @@ def format_size(bytes:int) -> str:
     return f"{value:.2f} {units[0]}"
 
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Aggregate `sacct -P` job steps into seff-style TSV rows.")
+    parser.add_argument('file', nargs='?',
+                        help="sacct -P dump to read (default: stdin)")
+    parser.add_argument('--format', default=DEFAULT_FORMAT,
+                        help="sacct --format column list of the input; a JobID|... header line in the input takes precedence "
+                             "(default: %(default)s)")
+    parser.add_argument('--batch-size', type=int, default=0, metavar='N',
+                        help="convert N jobs at a time with the NumPy batch engine (requires numpy)")
+    parser.add_argument('--jobs', '-j', type=int, default=1, metavar='N',
+                        help="parse a file input with N worker processes, split at job boundaries")
+    parser.add_argument('--unsorted', action='store_true',
+                        help="group job steps that are not contiguous in the input, e.g. concatenated dumps")
+    parser.add_argument('--memory-budget', type=int, default=512, metavar='MB',
+                        help="with --unsorted, spill buffered lines to disk partitions beyond MB megabytes (default: %(default)s)")
+    parser.add_argument('--spill-dir', metavar='DIR',
+                        help="directory for --unsorted spill files (default: the system temp directory)")
+    filters = parser.add_argument_group('filtering', "drop jobs by the fields of their top-level sacct row, or by the "
+                                        "MaxRSS/TotalCPU/JobName of all their steps, before they are aggregated")
+    filters.add_argument('--filter', action='append', default=[], metavar='EXPR',
+                         help="keep jobs matching EXPR, e.g. 'State != FAILED', 'JobName !~ acompile', 'Elapsed > 0', "
+                              "'Submit >= 2024-03-01', 'Elapsed > 0 or MaxRSS > 0 or TotalCPU > 0'; a bare word drops "
+                              "jobs with that State or JobName; repeatable")
+    filters.add_argument('--filter-file', action='append', default=[], metavar='PATH',
+                         help="read filter expressions or bare words, one per line, e.g. text_files/sacct_filters.txt")
+    fetch = parser.add_argument_group('sacct fetching', "run sacct over a date range instead of reading a dump")
+    fetch.add_argument('--starttime', '-S', metavar='TIME',
+                       help="fetch jobs from TIME (YYYY-MM-DD[THH:MM[:SS]])")
+    fetch.add_argument('--endtime', '-E', metavar='TIME',
+                       help="fetch jobs up to TIME (default: now)")
+    fetch.add_argument('--shard', choices=sorted(SHARD_SIZES), default='day',
+                       help="length of the time range fetched by each sacct call (default: %(default)s)")
+    fetch.add_argument('--max-procs', type=int, default=4, metavar='N',
+                       help="number of sacct calls to run concurrently (default: %(default)s)")
+    fetch.add_argument('--sacct-args', default='-a',
+                       help="extra arguments for every sacct call (default: %(default)s)")
+    fetch.add_argument('--sacct', default='sacct',
+                       help="sacct executable (default: %(default)s)")
+    output = parser.add_argument_group('output', "TSV on stdout unless another sink is given")
+    output.add_argument('--sqlite', metavar='PATH',
+                        help="upsert the rows into an SQLite database keyed on JobID instead of printing TSV")
+    output.add_argument('--sqlite-table', default='jobs', metavar='NAME',
+                        help="table for --sqlite (default: %(default)s)")
+    columnar = output.add_mutually_exclusive_group()
+    columnar.add_argument('--parquet', metavar='PATH',
+                          help="write typed columns (int64 seconds and bytes, timestamps) to a Parquet file (requires pyarrow)")
+    columnar.add_argument('--arrow', metavar='PATH',
+                          help="like --parquet but as an Arrow IPC file")
+    rollups = output.add_mutually_exclusive_group()
+    rollups.add_argument('--array-rollup', action='store_true',
+                         help="print one TSV row per array job (task ranges, state counts, usage totals and "
+                              "efficiency spread) instead of one row per job")
+    rollups.add_argument('--group-by', metavar='COLUMNS',
+                         help="print one TSV row per distinct value of the comma-separated COLUMNS "
+                              "(e.g. User,Account) with job counts and sum/max/mean/std of the usage columns")
+    rollups.add_argument('--sketch-by', metavar='COLUMNS',
+                         help="print approximate quantiles of CPU and memory efficiency, wait time and MaxRSS "
+                              "per distinct value of COLUMNS, from mergeable KLL sketches")
+    output.add_argument('--sketch-out', metavar='PATH',
+                        help="with --sketch-by, also save the sketches as JSON for SacctSketch.py merge/show")
+    output.add_argument('--sketch-k', type=int, default=200, metavar='K',
+                        help="KLL sketch size; the rank error shrinks roughly as 1/K (default: %(default)s)")
+    output.add_argument('--quantiles', type=parse_quantiles, default=DEFAULT_QUANTILES,
+                        help="quantiles printed by --sketch-by (default: 0.5,0.9,0.99)")
+    output.add_argument('--row-group-size', type=int, default=65536, metavar='N',
+                        help="rows per Parquet row group / Arrow record batch (default: %(default)s)")
+    incremental = parser.add_argument_group('incremental runs')
+    incremental.add_argument('--checkpoint', metavar='PATH',
+                             help="skip jobs completed in earlier runs and record the jobs of this run in PATH")
+    incremental.add_argument('--incremental', action='store_true',
+                             help="fetch from sacct starting at the checkpoint's End time high-water mark")
+    parser.add_argument('--cache-stats', action='store_true',
+                        help="print conversion cache and string interning hit rates to stderr at exit")
+    profiling = parser.add_argument_group('profiling')
+    profiling.add_argument('--profile', action='store_true',
+                           help="time the read, parse, aggregate, efficiency and output stages and print a summary "
+                                "with throughput, cache hit rates and peak memory to stderr at exit")
+    profiling.add_argument('--profile-json', metavar='PATH',
+                           help="with --profile, write the summary to PATH as JSON instead")
+    profiling.add_argument('--cprofile', metavar='PATH',
+                           help="with --profile, also run cProfile and dump its stats to PATH for pstats/snakeviz")
+    return parser.parse_args(argv)
 
-    print_seff_output_tsv_header()
+def main():
+    args = parse_args()
+    decoder = SacctDecoder.from_format(args.format)
+    checkpoint = Checkpoint.load(args.checkpoint) if args.checkpoint else None
+    try:
+        row_filter = RowFilter.from_args(args.filter, args.filter_file)
+    except (OSError, FilterError) as e:
+        sys.exit(str(e))
+
+    if args.incremental and not checkpoint:
+        sys.exit("--incremental requires --checkpoint")
+    if (args.profile_json or args.cprofile) and not args.profile:
+        sys.exit("--profile-json and --cprofile require --profile")
+    profiler = Profiler(args.cprofile, conversion_cache_stats) if args.profile else None
+
+    starttime = args.starttime
+    if args.incremental:
+        # resume from the checkpoint; --starttime only seeds the first run
+        starttime = checkpoint.starttime() or args.starttime
+        if not starttime:
+            sys.exit("the first --incremental run needs --starttime")
+
+    rollup = None
+    if args.array_rollup:
+        rollup = ArrayRollup()
+    elif args.group_by:
+        rollup = GroupRollup(split_columns(args.group_by))
+    elif args.sketch_by:
+        rollup = SketchRollup(split_columns(args.sketch_by), k=args.sketch_k, quantiles=args.quantiles)
+    if args.sketch_out and not args.sketch_by:
+        sys.exit("--sketch-out requires --sketch-by")
+    if rollup and (args.sqlite or args.parquet or args.arrow):
+        sys.exit("--array-rollup/--group-by/--sketch-by write TSV and cannot be combined with --sqlite/--parquet/--arrow")
+
+    if args.jobs > 1:
+        if rollup:
+            sys.exit("--array-rollup/--group-by/--sketch-by cannot be combined with --jobs")
+        if not args.file or starttime or checkpoint or args.unsorted:
+            sys.exit("--jobs requires a file input and cannot be combined with sacct fetching, --checkpoint or --unsorted")
+        from SacctParallel import parse_file_parallel
+        if profiler:
+            profiler.start()
+        with exit_on(FilterError):
+            parse_file_parallel(args.file, decoder, open_sink(args), args.jobs, args.batch_size, row_filter)
+        if args.cache_stats:
+            print("--cache-stats is not collected from worker processes", file=sys.stderr)
+        if profiler:
+            profiler.stop()
+            print(f"--profile stages are not collected from worker processes; {profiler.elapsed:.3f} s in total",
+                  file=sys.stderr)
+        return
 
-    for jid, jobs in parse_from_stdin():
-    
-        steps_aggregated  = aggregate_sacct_rows(jobs) # yields an aggregation of (usually) 3 lines of input
-        print_seff_output(steps_aggregated)
-
-        #for job in jobs:
-        #   print(job)
-        #  print_seff_output(job)
-
-# Function to convert human-readable memory sizes (e.g., '320K', '4G') to bytes
-def convert_to_bytes(mem_str: str) -> int:
-
-    if mem_str == '': return 0
-
-    mem_str = mem_str.strip().upper()
-    if mem_str.endswith('K'):
-        return int(float(mem_str[:-1]) * 1024)
-    elif mem_str.endswith('M'):
-        return int(float(mem_str[:-1]) * 1024 ** 2)
-    elif mem_str.endswith('G'):
-        return int(float(mem_str[:-1]) * 1024 ** 3)
-    elif mem_str.endswith('T'):
-        return int(float(mem_str[:-1]) * 1024 ** 4)
-    else:
-        # Assume it's already in bytes if there's no suffix
-        return int(float(mem_str))
+    with ExitStack() as stack:
+        if profiler:
+            # reported even when the run stops early, e.g. on a bad filter
+            stack.callback(profiler.report, decoder, row_filter, args.profile_json)
+            stack.callback(profiler.stop)
+            profiler.start()
+        # a filter on a column named by a header line is only checked once the header is read
+        stack.enter_context(exit_on(FilterError))
+        if starttime:
+            if args.file:
+                sys.exit("sacct fetching cannot be combined with a file input")
+            lines = fetch_sharded_lines(",".join(decoder.columns),
+                                        starttime,
+                                        args.endtime,
+                                        shard=args.shard,
+                                        max_procs=args.max_procs,
+                                        sacct_args=shlex.split(args.sacct_args),
+                                        sacct=args.sacct)
+        elif args.file:
+            lines = stack.enter_context(open(args.file))
+        else:
+            lines = sys.stdin
+        if rollup:
+            # check the --group-by/--sketch-by columns before any row is read
+            lines = read_header(lines, decoder)
+            start_rollup(rollup, decoder)
+        if profiler:
+            lines = profiler.count_lines(lines)
+
+        if args.unsorted:
+            groups = group_unsorted_lines(lines, decoder, args.memory_budget * 1024 * 1024, args.spill_dir, row_filter)
+        else:
+            groups = parse_sacct_lines(lines, decoder, row_filter)
+        if profiler:
+            groups = profiler.iter('group' if args.unsorted else 'parse', groups)
+        if checkpoint:
+            groups = skip_checkpointed(groups, checkpoint)
+            if profiler:
+                groups = profiler.iter('checkpoint', groups)
+        if rollup:
+            write_rollup(groups, decoder, rollup, args.batch_size, profiler)
+            if args.sketch_out:
+                rollup.save(args.sketch_out)
+        else:
+            write_output(groups, decoder, open_sink(args), args.batch_size, profiler)
+
+    if checkpoint:
+        checkpoint.save()
+        print(f"checkpoint {checkpoint.path}: skipped {checkpoint.skipped} jobs already reported, "
+              f"next start {checkpoint.starttime()}", file=sys.stderr)
+
+    if args.cache_stats:
+        print_cache_stats(decoder)
+
+@contextmanager
+def exit_on(error: type):
+    try:
+        yield
+    except error as e:
+        sys.exit(str(e))
+
+def skip_checkpointed(groups, checkpoint: Checkpoint):
+    """Drop step groups of jobs completed in an earlier run and record the rest."""
+    for jid, jobs in groups:
+        top_level = find_top_level(jobs) or jobs[0]
+        if checkpoint.is_done(jid, top_level.State, top_level.End):
+            checkpoint.skipped += 1
+            continue
+        checkpoint.record(jid, top_level.State, top_level.Submit, top_level.End)
+        yield jid, jobs
 
-# THIS IS NOW DEFUNCT IN ORDER TO READ INPUT FROM STDIN
+def iter_results(groups, batch_size: int = 0, profiler: Optional[Profiler] = None):
+    """A JobRecord with efficiencies for each step group, `batch_size` at a time when using the NumPy engine."""
+    if batch_size > 0:
+        try:
+            from SacctBatch import process_batches
+        except ImportError as e:
+            sys.exit(f"--batch-size requires numpy: {e}")
+        if profiler:
+            return profiler.count_jobs(profiler.iter('batch', process_batches(groups, batch_size, summarize_top_level)))
+        return process_batches(groups, batch_size, summarize_top_level)
+
+    if profiler:
+        return profiler.count_jobs(iter_efficiencies(groups, profiler))
+    return iter_efficiencies(groups)
+
+def write_output(groups, decoder: SacctDecoder, sink, batch_size: int = 0, profiler: Optional[Profiler] = None):
+    make_row = seff_output_typed_row if sink.typed else seff_output_tsv_row
+    write = sink.write
+    if profiler:
+        make_row = profiler.wrap('format', make_row)
+        write = profiler.wrap('write', write)
+    started = False
+    for record in iter_results(groups, batch_size, profiler):
+        # the sink is started lazily so that extra columns from a header line in the input are known
+        if not started:
+            sink.start(decoder.extra_fields)
+            started = True
+
+        write(make_row(record))
+
+    if not started:
+        sink.start(decoder.extra_fields)
+    sink.close()
+
+def split_columns(columns: str) -> List[str]:
+    return [column.strip() for column in columns.split(',') if column.strip()]
+
+def write_rollup(groups, decoder: SacctDecoder, rollup, batch_size: int = 0, profiler: Optional[Profiler] = None):
+    add = profiler.wrap('rollup', rollup.add) if profiler else rollup.add
+    started = False
+    for record in iter_results(groups, batch_size, profiler):
+        # started again once the rows are decoded, in case a later header line
+        # changed the columns
+        if not started:
+            start_rollup(rollup, decoder)
+            started = True
+        add(record)
+
+    if not started:
+        start_rollup(rollup, decoder)
+    rollup.write(sys.stdout)
+
+def start_rollup(rollup, decoder: SacctDecoder):
+    try:
+        rollup.start(decoder.extra_fields)
+    except ValueError as e:
+        sys.exit(str(e))
+
+def read_header(lines, decoder: SacctDecoder):
+    """Set the decoder's columns from a header on the first line; the lines, that one included."""
+    lines = iter(lines)
+    first_line = next(lines, None)
+    if first_line is None:
+        return iter(())
+    if is_header(first_line):
+        decoder.set_columns(parse_format(first_line))
+    return itertools.chain([first_line], lines)
+
+def open_sink(args):
+    if args.sqlite:
+        return SQLiteSink(args.sqlite, table=args.sqlite_table)
+    if args.parquet or args.arrow:
+        try:
+            return ColumnarSink(args.parquet or args.arrow,
+                                file_format='parquet' if args.parquet else 'arrow',
+                                row_group_size=args.row_group_size)
+        except ImportError as e:
+            sys.exit(f"--parquet/--arrow require pyarrow: {e}")
+    return TSVSink()
+
+def print_cache_stats(decoder: SacctDecoder):
+    print("conversion caches:", file=sys.stderr)
+    for name, stats in conversion_cache_stats().items():
+        print(f"  {name}: {stats['hits']} hits, {stats['misses']} misses ({100 * stats['hit_rate']:.1f}%), {stats['size']} cached",
+              file=sys.stderr)
+    print("interned columns:", file=sys.stderr)
+    for field, stats in decoder.intern_stats().items():
+        if field == 'overflow':
+            print(f"  {stats['lookups']} values not interned (table full)", file=sys.stderr)
+            continue
+        print(f"  {field}: {stats['distinct']} distinct values in {stats['lookups']} lines ({100 * stats['hit_rate']:.1f}% shared)",
+              file=sys.stderr)
+
+def iter_efficiencies(groups, profiler: Optional[Profiler] = None):
+    aggregate, efficiencies = aggregate_sacct_rows, calculate_efficiencies
+    if profiler:
+        aggregate = profiler.wrap('aggregate', aggregate)
+        efficiencies = profiler.wrap('efficiency', efficiencies)
+    for jid, jobs in groups:
+        record = aggregate(jobs) # an aggregation of (usually) 3 lines of input
+        yield efficiencies(record)
+
+# single job lookups; see SacctFetch.fetch_sharded_lines() for date ranges
 def parse_sacct(job_id: str):
 
+    sacct_format = 'JobID,User,Group,State,Cluster,AllocCPUS,REQMEM,TotalCPU,Elapsed,MaxRSS,ExitCode,NNodes,NTasks'
     if job_id != "":
         # Run the sacct command
-        cmd = [
-            'sacct',
-            '-P', '-n', '-a',
-            '--format', 'JobID,User,Group,State,Cluster,AllocCPUS,REQMEM,TotalCPU,Elapsed,MaxRSS,ExitCode,NNodes,NTasks',
-            '-j', job_id
-        ]
+        cmd = sacct_command(sacct_format, ['-a', '-j', job_id])
         
         # Capture the output
         result = subprocess.run(cmd, capture_output=True, text=True)
@@ -148,114 +454,92 @@ def parse_sacct(job_id: str):
 52791.batch|||CANCELLED|slurm|128||00:29.686|2-00:00:03|36404576K|0:15|1|1
 """.strip().split('\n')
     
-    lines = alpine_lines + riviera_lines
+        lines = alpine_lines + riviera_lines
 
     # List to hold the parsed job information
-    for jid, jobs in parse_sacct_lines(lines):
+    for jid, jobs in parse_sacct_lines(lines, SacctDecoder.from_format(sacct_format)):
         yield jid, jobs
 
-def parse_from_stdin():
-    lines = sys.stdin.readlines()
-    for jid, jobs in parse_sacct_lines(lines):
+def parse_from_stdin(decoder: Optional[SacctDecoder] = None):
+    # iterate the stream rather than readlines() so that memory stays bounded
+    # by the current job's step group and rows are emitted while sacct is writing
+    for jid, jobs in parse_sacct_lines(sys.stdin, decoder):
         yield jid, jobs
 
-def get_job_id_prefix(job_id_str):
-    if job_id_str.find('.') > 0:
-        parts = job_id_str.split('.')
-        return parts[0]
-    
-    return job_id_str
+def parse_sacct_lines(lines, decoder: Optional[SacctDecoder] = None, row_filter: Optional[RowFilter] = None):
+    if decoder is None:
+        decoder = SacctDecoder.from_format()
+    decode = decoder.decode
+    # bound at the first job, after any header line has named the columns
+    bound = False
+    keep = keep_group = None
 
-def parse_sacct_lines(lines):
     jobs = []
     last_job_id = None
+    skipping = None
     # Parse each line
     for line in lines:
-        if line.find('JobID') >= 0:
-            # this is a header
+        if is_header(line):
+            # a -P header names the columns of the lines that follow
+            decoder.set_columns(parse_format(line))
+            decode = decoder.decode
+            bound = False
             continue
-        fields = line.strip().split('|')
-        job_id_prefix = get_job_id_prefix(fields[0])
 
-        if last_job_id is not None and job_id_prefix != last_job_id:
-            yield last_job_id, jobs
+        if skipping is not None:
+            # steps of a rejected job are passed over without decoding
+            if decoder.job_id_prefix(line) == skipping:
+                continue
+            skipping = None
+
+        job_data = decode(line)
+        if not job_data.JobID:
+            # blank line
+            continue
+        prefix = job_id_prefix(job_data.JobID)
+
+        if prefix != last_job_id:
+            if jobs and kept_group(row_filter, keep_group, jobs):
+                yield last_job_id, jobs
             jobs = []
+            last_job_id = prefix
+            if row_filter is not None and not bound:
+                keep = row_filter.bind(decoder.row_type._fields)
+                keep_group = row_filter.bind_group(decoder.row_type._fields)
+                bound = True
+            # most filters look at the first row of a group, the top-level row
+            if keep is not None and not keep(job_data):
+                row_filter.rejected += 1
+                skipping = prefix
+                continue
 
-        last_job_id = job_id_prefix
-
-
-        # Map each field to a dictionary key
-        job_data = {
-            'JobID': fields[0],
-            'User': fields[1],
-            'Group': fields[2],
-            'State': fields[3],
-            'Cluster': fields[4],
-            'AllocCPUS': fields[5],
-            'REQMEM': fields[6],
-            'TotalCPU': fields[7],
-            'Elapsed': fields[8],
-            'MaxRSS': fields[9],
-            'ExitCode': fields[10],
-            'NNodes': fields[11],
-            'NTasks': fields[12],
-            'JobName': fields[13],
-            'Submit': fields[14],
-            'Start': fields[15],
-            'End': fields[16],
-            'Account': fields[17]
-        }
-            
         jobs.append(job_data)
 
-    
-    yield last_job_id, jobs
+    if jobs and kept_group(row_filter, keep_group, jobs):
+        yield last_job_id, jobs
 
-def calculate_efficiencies(job_data):
-    # Convert memory and CPU times
-    requested_mem = convert_to_bytes(job_data['REQMEM'])
-    if type(job_data['MaxRSS']) == type(str()):
-        max_rss = convert_to_bytes(job_data['MaxRSS'])
-    else:
-        max_rss = job_data['MaxRSS']
-    
-    
-    # Example data for utilized memory (from TRESData):
-    max_rss_utilized = max_rss  # This would be retrieved based on your logic
+def kept_group(row_filter: Optional[RowFilter], keep_group, jobs) -> bool:
+    """Whether a whole step group passes the filters on step-aggregated fields."""
+    if keep_group is None or keep_group(jobs):
+        return True
+    row_filter.rejected += 1
+    return False
 
+def calculate_efficiencies(record: JobRecord) -> JobRecord:
+    """Fill in the efficiencies of an aggregated job from its converted fields."""
     # Memory Efficiency
-    memory_efficiency = (max_rss_utilized / requested_mem) * 100 if requested_mem else 0
-    
-    # Total CPU in seconds (convert to seconds)
-    if isinstance(job_data['TotalCPU'], Number):
-        total_cpu_time = job_data['TotalCPU']
-    else:
-        total_cpu_time = parse_total_cpu_time(job_data['TotalCPU'])
-    
-    cpu_wall_time = (parse_time(job_data['Elapsed']) * int(job_data['AllocCPUS']))
+    record.memory_efficiency = (record.max_rss / record.req_mem) * 100 if record.req_mem else 0
+
+    record.cpu_wall_time = record.elapsed * record.alloc_cpus
 
     # CPU Efficiency
     try:
-        cpu_efficiency = (total_cpu_time / cpu_wall_time) * 100 if total_cpu_time else 0
+        record.cpu_efficiency = (record.total_cpu / record.cpu_wall_time) * 100 if record.total_cpu else 0
     except ZeroDivisionError:
-        print(f"Warning 0 Elapsed time {job_data['JobID']}", file=sys.stderr)
-        cpu_efficiency = nan
-    
-    return {
-        'JobID': job_data['JobID'],
-        'User': job_data['User'],
-        'MaxRSS': job_data['MaxRSS'],
-        'MaxRSS Utilized': max_rss_utilized,
-        'Total CPU': total_cpu_time,
-        'CPU Efficiency': cpu_efficiency,
-        'CPU Wall-time': cpu_wall_time,
-        'Memory Utilized': max_rss_utilized,
-        'Memory Efficiency': memory_efficiency,
-        'REQMEM': job_data['REQMEM'],
-        'Submit': job_data['Submit'],
-        'Start': job_data['Start'],
-        'End': job_data['End']
-    }
+        print(f"Warning 0 Elapsed time {record.JobID}", file=sys.stderr)
+        record.cpu_efficiency = nan
+
+    return record
 
 # Function to convert time strings like "00:20:00" into seconds
 def convert_to_seconds(time_str: str) -> int:
@@ -267,48 +551,6 @@ def convert_to_seconds(time_str: str) -> int:
         return hours * 3600 + minutes * 60 + seconds
     return 0
 
-def seconds_to_timeformat(seconds: int) -> str:
-    days = int(seconds/(3600*24))
-    seconds_remaining = seconds % (3600*24)
-    hours = int(seconds_remaining/3600)
-    seconds_remaining = seconds_remaining % 3600
-    minutes = int(seconds_remaining/60)
-    seconds = int(seconds_remaining % 60)
-
-    day_str = ''
-    if days > 0: day_str = f"{days}-"
-    return f"{day_str}{hours:02d}:{minutes:02d}:{seconds:02d}"
-
-
-def parse_time(s: Optional[str]) -> float:
-    """
-    Parse Slurm-style time strings into seconds.
-    Returns 0.0 if input is missing or invalid.
-    """
-    if not s or s.strip() in {"", "Unknown"}:
-        return 0.0
-
-    try:
-        parts = s.strip().split(":")
-        if len(parts) == 3:
-            hh, m, sec = parts
-            if hh.find('-') > 0:
-                days,hours = hh.split('-')
-                h = int(days) * 24 + int(hours)
-            else:
-                h = int(hh)
-            return h * 3600 + int(m) * 60 + float(sec)
-        elif len(parts) == 2:
-            m, sec = parts
-            return int(m) * 60 + float(sec)
-        elif len(parts) == 1:
-            return float(parts[0])
-    except (ValueError, TypeError):
-        return 0.0
-    
-    return 0
-
-
 def parse_total_cpu_time(time_str: str) -> float:
     # Format: HH:MM:SS.sss or MM:SS.sss
     
@@ -325,79 +567,88 @@ def parse_total_cpu_time(time_str: str) -> float:
         # Fallback for just seconds
         return float(parts[0])
 
-def print_seff_output(job_data):
-    efficiencies = calculate_efficiencies(job_data)
-    #print_seff_output_description(efficiencies, job_data)
-    print_seff_output_tsv(efficiencies, job_data)
+def print_seff_output(record: JobRecord):
+    calculate_efficiencies(record)
+    #print_seff_output_description(record)
+    print_seff_output_tsv(record)
 
-def print_seff_output_tsv_header():
-    print_seff_output_tsv(None, None, True)
+def print_seff_output_tsv_header(extra_fields=()):
+    print_seff_output_tsv(None, True, extra_fields)
 
-def print_seff_output_tsv(efficiencies, job_data, print_header=False): 
+def print_seff_output_tsv(record: Optional[JobRecord], print_header=False, extra_fields=()):
     if print_header:
-        print('JobID',
-              'User',
-              'Group',
-              'State',
-              'ExitCode',
-            'NNodes', 
-            'AllocCPUS',
-            'CPU_Utilized',
-            'CPU_Efficiency',
-            'core_walltime',
-            'Elapsed',
-            'Elapsed_raw',
-            'MaxRSS_Utilized',
-            'MaxRSS_Utilized_raw',
-            'REQMEM',
-            'memory_efficiency',
-            'JobNames',
-            'Submit',
-            'Start',
-            'End',
-            'Account',
-            sep="\t")
-        
+        print(*SEFF_TSV_COLUMNS, *extra_fields, sep="\t")
         return
 
-    print(efficiencies['JobID'], 
-          efficiencies['User'],
-          job_data['Group'],
-          job_data['State'],
-          job_data['ExitCode'],
-          job_data['NNodes'],
-          job_data['AllocCPUS'],
-          seconds_to_timeformat(efficiencies['Total CPU']),
-          efficiencies['CPU Efficiency'],
-          seconds_to_timeformat(efficiencies['CPU Wall-time']),
-          job_data['Elapsed'],
-          parse_time(job_data['Elapsed']),
-          format_size(efficiencies['MaxRSS Utilized']),
-          efficiencies['MaxRSS Utilized'],
-          convert_to_bytes(efficiencies['REQMEM']),
-          efficiencies['Memory Efficiency'],
-          job_data['JobNames'],
-          efficiencies['Submit'],
-          efficiencies['Start'],
-          efficiencies['End'],
-          job_data['Account'],
-          sep="\t")
-
-def print_seff_output_description(efficiencies, job_data): 
-    print(f"Job ID: {efficiencies['JobID']}")
-    print(f"User/Group: {efficiencies['User']}/{job_data['Group']}")
-    print(f"State: {job_data['State']} (exit code {job_data['ExitCode']})")
-    print(f"Nodes: {job_data['NNodes']}")
-    print(f"Cores per Node: {job_data['AllocCPUS']}")
-    
-    print(f"CPU Utilized: {seconds_to_timeformat(efficiencies['Total CPU'])}")
-    print(f"CPU Efficiency: {efficiencies['CPU Efficiency']:.2f}% of {seconds_to_timeformat(efficiencies['CPU Wall-time'])} core-walltime")
-    print(f"Job Wall-clock time: {job_data['Elapsed']}")
-    print(f"Memory Utilized: {format_size(efficiencies['MaxRSS Utilized'])}")  
-
-    req_mem_bytes = convert_to_bytes(efficiencies['REQMEM'])
-
-    print(f"Memory Efficiency: {efficiencies['Memory Efficiency']:.2f}% of {format_size(req_mem_bytes)}")
+    print(*seff_output_tsv_row(record), sep="\t")
+
+def seff_output_tsv_row(record: JobRecord) -> list:
+    return [record.JobID,
+            record.User,
+            record.Group,
+            record.State,
+            record.ExitCode,
+            record.NNodes,
+            record.AllocCPUS,
+            seconds_to_timeformat(record.total_cpu),
+            record.cpu_efficiency,
+            seconds_to_timeformat(record.cpu_wall_time),
+            seconds_to_timeformat(int(record.elapsed)),
+            record.elapsed,
+            format_size(record.max_rss),
+            record.max_rss,
+            record.req_mem,
+            record.memory_efficiency,
+            record.JobNames,
+            record.Submit,
+            record.Start,
+            record.End,
+            record.Account,
+            _blank(record.wait_time),
+            _blank(record.timespan),
+            *record.extra]
+
+def _blank(value):
+    return '' if value is None else value
+
+def seff_output_typed_row(record: JobRecord) -> list:
+    """The seff row in COLUMNAR_SCHEMA order: durations in whole seconds and sizes in bytes."""
+    return [record.JobID,
+            record.User,
+            record.Group,
+            record.State,
+            record.ExitCode,
+            record.NNodes,
+            record.AllocCPUS,
+            int(record.total_cpu),
+            record.cpu_efficiency,
+            int(record.cpu_wall_time),
+            int(record.elapsed),
+            record.max_rss,
+            record.req_mem,
+            record.memory_efficiency,
+            record.JobNames,
+            record.submit_time,
+            record.start_time,
+            record.end_time,
+            record.Account,
+            record.wait_time,
+            record.timespan,
+            *record.extra]
+
+def print_seff_output_description(record: JobRecord):
+    print(f"Job ID: {record.JobID}")
+    print(f"User/Group: {record.User}/{record.Group}")
+    print(f"State: {record.State} (exit code {record.ExitCode})")
+    print(f"Nodes: {record.NNodes}")
+    print(f"Cores per Node: {record.AllocCPUS}")
+
+    print(f"CPU Utilized: {seconds_to_timeformat(record.total_cpu)}")
+    print(f"CPU Efficiency: {record.cpu_efficiency:.2f}% of {seconds_to_timeformat(record.cpu_wall_time)} core-walltime")
+    print(f"Job Wall-clock time: {seconds_to_timeformat(int(record.elapsed))}")
+    print(f"Memory Utilized: {format_size(record.max_rss)}")
+
+    print(f"Memory Efficiency: {record.memory_efficiency:.2f}% of {format_size(record.req_mem)}")
     print()
     sys.stdout.flush()
 
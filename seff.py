@@ -1,35 +1,185 @@
 from SlurmJob import SlurmJob
 from SlurmTres import TRESData, TRESItem
-import json
+from SacctJson import SacctJsonReader
+from SacctJsonBackend import BACKENDS, decode_jobs, job_decoder, resolve_backend
+from SacctSinks import ColumnarSink
+from itertools import islice
+from typing import Iterable, Iterator, List, Tuple, Union
+import argparse
+import os
 import sys
 
-def main():
-    if len(sys.argv) != 2:
-        print(f"Usage: {sys.argv[0]} <job_data.json>")
-        sys.exit(1)
+# raw job dicts handed to a worker at a time with --workers
+WORKER_BATCH_JOBS = 512
+
+# typed columns for --parquet/--arrow
+SEFF_STATS_SCHEMA = (("JobID", "int64"),
+                     ("JobName", "string"),
+                     ("Elapsed_raw", "int64"),
+                     ("CPU_Utilized_raw", "int64"),
+                     ("CPU_Efficiency", "float64"),
+                     ("REQMEM_per_cpu", "int64"),
+                     ("Memory_Utilized_raw", "int64"),
+                     ("Memory_Efficiency", "float64"),
+                     ("Start", "timestamp"),
+                     ("End", "timestamp"))
 
-    json_file = sys.argv[1]
-    with open(json_file) as f:
-        data = json.load(f)
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="seff-style statistics from `sacct --json` output.")
+    parser.add_argument('json_file', metavar='job_data.json')
+    parser.add_argument('--json-lines', action='store_true',
+                        help="the input is JSON Lines, one job per line as written by SacctJson.py "
+                             "(the default for .jsonl files)")
+    columnar = parser.add_mutually_exclusive_group()
+    columnar.add_argument('--parquet', metavar='PATH',
+                          help="write the statistics as typed columns to a Parquet file (requires pyarrow)")
+    columnar.add_argument('--arrow', metavar='PATH',
+                          help="like --parquet but as an Arrow IPC file")
+    parser.add_argument('--row-group-size', type=int, default=65536, metavar='N',
+                        help="rows per Parquet row group / Arrow record batch (default: %(default)s)")
+    parser.add_argument('--json-backend', choices=('auto',) + BACKENDS, default='auto',
+                        help="JSON decoder; auto uses the fastest installed one for JSON Lines and streams a whole "
+                             "document with the json module, while a named one decodes a whole document at once, "
+                             "which --workers cannot split (default: %(default)s)")
+    parser.add_argument('--workers', '-j', type=int, default=1, metavar='N',
+                        help="build the jobs and their statistics in N worker processes, in batches of jobs, "
+                             "or byte ranges of a JSON Lines input; the output order is unchanged (default: %(default)s)")
+    return parser.parse_args(argv)
 
-    meta = data.get("meta")
-    command = meta.get("command")
-    print(command)
-    Slurm = meta.get("Slurm")
-    print(Slurm)
+def seff_stats_row(job: SlurmJob, seff_info: dict) -> list:
+    """One SEFF_STATS_SCHEMA row: durations in seconds, memory in bytes, times as epoch seconds."""
+    mem_per_cpu = job.required.memory_per_cpu.number if job.required and job.required.memory_per_cpu else None
+    return [job.job_id,
+            job.name,
+            seff_info["Elapsed Time (seconds)"],
+            seff_info["CPU Time (seconds)"],
+            seff_info["CPU Efficiency (%)"],
+            mem_per_cpu * 1024 ** 2 if mem_per_cpu is not None else None,
+            seff_info["Memory Utilized (bytes)"],
+            seff_info["Memory Efficiency (%)"],
+            job.time.start if job.time else None,
+            job.time.end if job.time else None]
 
-    for job_data in data.get('jobs'):
+def seff_jobs(job_dicts: Iterable[dict]) -> Iterator[SlurmJob]:
+    # seff_stats() reads the job's fields and TRES and only the peak memory of
+    # the steps, which lazy steps keep without their TRES
+    for job_data in job_dicts:
+        yield SlurmJob.from_json(job_data, lazy=True, keep_tres=False)
 
-        # Create a SlurmJob from the JSON dictionary
-        job = SlurmJob.from_json(job_data)
+def json_lines_jobs(lines: Iterable[str], backend: str) -> Iterator[SlurmJob]:
+    """The jobs of JSON Lines, as seff_jobs() builds them, decoded with `backend`."""
+    decode = job_decoder(backend, lazy=True, keep_tres=False)
+    for line in lines:
+        if line.strip():
+            yield decode(line)
 
+def seff_results(jobs: Iterable[SlurmJob], with_rows: bool) -> Iterator[Union[list, str]]:
+    """For each job, its SEFF_STATS_SCHEMA row when with_rows, else its printed SEFF fields."""
+    for job in jobs:
         # Get SEFF-style info
         seff_info = job.seff_stats()
 
-        # Print the SEFF fields
-        for key, value in seff_info.items():
-            print(f"{key}: {value}")
+        if with_rows:
+            yield seff_stats_row(job, seff_info)
+            continue
+
+        # The SEFF fields
+        yield "".join(f"{key}: {value}\n" for key, value in seff_info.items())
+
+def _worker_results(results: Iterator[Union[list, str]], with_rows: bool) -> Union[List[list], str]:
+    # only the small rows or text are sent back from a worker, not the jobs
+    return list(results) if with_rows else "".join(results)
+
+def _seff_batch(task: Tuple[List[dict], bool]) -> Union[List[list], str]:
+    job_dicts, with_rows = task
+    return _worker_results(seff_results(seff_jobs(job_dicts), with_rows), with_rows)
+
+def _seff_range(task: Tuple[str, int, int, str, bool]) -> Union[List[list], str]:
+    from SacctParallel import read_range
+
+    path, start, end, backend, with_rows = task
+    jobs = json_lines_jobs(read_range(path, start, end), backend)
+    return _worker_results(seff_results(jobs, with_rows), with_rows)
+
+def parallel_seff_results(job_dicts: Iterable[dict], with_rows: bool, workers: int) -> Iterator[Union[List[list], str]]:
+    """seff_results() of batches of raw jobs in `workers` processes, a list of rows or text per batch, in input order."""
+    from SacctParallel import ordered_map
+
+    job_dicts = iter(job_dicts)
+    batches = iter(lambda: list(islice(job_dicts, WORKER_BATCH_JOBS)), [])
+    return ordered_map(_seff_batch, ((batch, with_rows) for batch in batches), workers)
+
+def parallel_json_lines_results(path: str, with_rows: bool, workers: int,
+                                backend: str = 'json') -> Iterator[Union[List[list], str]]:
+    """seff_results() of byte ranges of a JSON Lines file, decoded in `workers` processes, in file order."""
+    from SacctParallel import CHUNK_BYTES, ordered_map, split_line_ranges
+
+    n_chunks = max(workers, -(-os.path.getsize(path) // CHUNK_BYTES))
+    tasks = ((path, start, end, backend, with_rows) for start, end in split_line_ranges(path, n_chunks))
+    return ordered_map(_seff_range, tasks, workers)
+
+def main():
+    args = parse_args()
+    try:
+        backend = resolve_backend(args.json_backend)
+    except ValueError as e:
+        sys.exit(f"--json-backend: {e}")
+    json_lines = args.json_lines or args.json_file.endswith(('.jsonl', '.ndjson'))
+    # a named backend decodes a whole document at once
+    whole_document = not json_lines and args.json_backend != 'auto'
+    if whole_document and args.workers > 1:
+        sys.exit("--json-backend with --workers needs JSON Lines input (see SacctJson.py); "
+                 "use --json-backend auto to stream a document to the workers")
+
+    sink = None
+    if args.parquet or args.arrow:
+        try:
+            sink = ColumnarSink(args.parquet or args.arrow,
+                                schema=SEFF_STATS_SCHEMA,
+                                file_format='parquet' if args.parquet else 'arrow',
+                                row_group_size=args.row_group_size)
+        except ImportError as e:
+            sys.exit(f"--parquet/--arrow require pyarrow: {e}")
+        sink.start()
+
+    with_rows = sink is not None
+    with open(args.json_file, 'rb' if whole_document else 'r') as f:
+        if json_lines:
+            # JSON Lines hold only the jobs, without meta
+            jobs = json_lines_jobs(f, backend)
+        else:
+            if whole_document:
+                members, jobs = decode_jobs(f.read(), backend, lazy=True, keep_tres=False)
+            else:
+                # jobs are decoded one at a time instead of loading the whole document
+                reader = SacctJsonReader(f)
+                members = reader.members
+                job_dicts = reader.job_dicts()
+                jobs = seff_jobs(job_dicts)
+
+            meta = members.get("meta") or {}
+            command = meta.get("command")
+            print(command)
+            Slurm = meta.get("Slurm")
+            print(Slurm)
+
+        # rows or text, a batch of jobs at a time from workers
+        if args.workers > 1 and json_lines:
+            chunks = parallel_json_lines_results(args.json_file, with_rows, args.workers, backend)
+        elif args.workers > 1:
+            chunks = parallel_seff_results(job_dicts, with_rows, args.workers)
+        else:
+            chunks = ([result] if with_rows else result for result in seff_results(jobs, with_rows))
+
+        for chunk in chunks:
+            if sink:
+                for row in chunk:
+                    sink.write(row)
+            else:
+                sys.stdout.write(chunk)
+
+    if sink:
+        sink.close()
 
 if __name__ == "__main__":
     main()
-
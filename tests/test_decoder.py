@@ -0,0 +1,23 @@
+import SacctFilter
+import parse_sacct
+from SacctDecoder import SacctDecoder, conversion_cache_stats, job_id_prefix, seconds_to_timeformat
+
+
+def test_job_id_prefix():
+    assert job_id_prefix('123') == '123'
+    assert job_id_prefix('123.batch') == '123'
+    assert job_id_prefix('123_4.0') == '123_4'
+    assert SacctDecoder.from_format().job_id_prefix('123.extern|user|group\n') == '123'
+
+
+def test_timeformat_is_cached_on_whole_seconds():
+    before = conversion_cache_stats()['seconds_to_timeformat']
+    assert seconds_to_timeformat(90061.25) == seconds_to_timeformat(90061.75) == '1-01:01:01'
+    after = conversion_cache_stats()['seconds_to_timeformat']
+    assert after['hits'] - before['hits'] >= 1
+
+
+def test_modules_share_one_set_of_converters():
+    assert parse_sacct.convert_to_bytes is SacctFilter.convert_to_bytes
+    assert parse_sacct.parse_time is SacctFilter.parse_time
+    assert parse_sacct.conversion_cache_stats is conversion_cache_stats
@@ -0,0 +1,60 @@
+import pytest
+
+from parse_sacct import parse_sacct_lines
+from SacctDecoder import SacctDecoder
+from SacctFilter import RowFilter
+
+FORMAT = "JobID,State,TotalCPU,Elapsed,MaxRSS,JobName"
+
+LINES = """\
+1|COMPLETED|01:00.000|00:10:00||run
+1.batch|COMPLETED|01:00.000|00:10:00|2G|batch
+1.0|COMPLETED|00:00.000|00:10:00|1G|bash
+2|COMPLETED|00:30.000|00:05:00||analysis
+2.batch|COMPLETED|00:30.000|00:05:00|512M|batch
+3|CANCELLED by 42|00:00.000|00:00:00||idle
+3.batch|CANCELLED|00:00.000|00:00:00|0|batch
+""".splitlines(keepends=True)
+
+
+def kept(*expressions):
+    row_filter = RowFilter(expressions)
+    return [jid for jid, _ in parse_sacct_lines(LINES, SacctDecoder.from_format(FORMAT), row_filter)]
+
+
+def test_step_aggregated_fields_are_read_from_the_whole_group():
+    # the top-level row's MaxRSS is always blank
+    assert kept("MaxRSS > 0") == ['1', '2']
+    assert kept("MaxRSS > 1G") == ['1']
+    assert kept("JobName ~ bash") == ['1']
+    assert kept("JobName !~ bash") == ['2', '3']
+
+
+def test_any_of():
+    assert kept("Elapsed > 0 or MaxRSS > 0 or TotalCPU > 0") == ['1', '2']
+    assert kept("State == CANCELLED or JobName == analysis") == ['2', '3']
+
+
+def test_bare_word_is_state_and_job_name_not_equal():
+    assert kept("bash") == kept("JobName != bash") == ['2', '3']
+    assert kept("CANCELLED") == kept("State != CANCELLED", "JobName != CANCELLED") == ['1', '2']
+
+
+def test_parallel_parsing_rejects_a_bad_filter_before_any_output(tmp_path):
+    from SacctFilter import FilterError
+    from SacctParallel import parse_file_parallel
+
+    class Sink:
+        accepts_text = True
+        typed = False
+        started = False
+
+        def start(self, extra_fields=()):
+            self.started = True
+
+    path = tmp_path / 'dump.txt'
+    path.write_text("".join(LINES))
+    sink = Sink()
+    with pytest.raises(FilterError):
+        parse_file_parallel(str(path), SacctDecoder.from_format(FORMAT), sink, 2, row_filter=RowFilter(["Foo == 1"]))
+    assert not sink.started
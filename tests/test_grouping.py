@@ -0,0 +1,25 @@
+from SacctDecoder import SacctDecoder
+from SacctGrouping import SPILL_PARTITIONS, _partition, group_unsorted_lines
+
+
+def test_skewed_partition_splits_at_the_next_depth():
+    prefixes = [str(6000000 + i) for i in range(20000)]
+    skewed = [prefix for prefix in prefixes if _partition(prefix, 0) == 7]
+    assert len(skewed) > 100
+    # a linear hash would send all of them to one partition again
+    assert len({_partition(prefix, 1) for prefix in skewed}) > SPILL_PARTITIONS // 2
+
+
+def test_spilled_groups_match_in_memory_groups(tmp_path):
+    lines = []
+    for step in ('', '.batch', '.extern'):
+        for job in range(200):
+            lines.append(f"{job}{step}|user|COMPLETED\n")
+    decoder = SacctDecoder(['JobID', 'User', 'State'])
+
+    in_memory = dict(group_unsorted_lines(lines, decoder))
+    spilled = dict(group_unsorted_lines(lines, decoder, memory_budget=100, spill_dir=str(tmp_path)))
+
+    assert spilled.keys() == in_memory.keys()
+    for prefix, rows in spilled.items():
+        assert [row.JobID for row in rows] == [prefix, f"{prefix}.batch", f"{prefix}.extern"]
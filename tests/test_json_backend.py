@@ -0,0 +1,13 @@
+import os
+
+import pytest
+
+from SacctJsonBackend import parity_errors
+
+TEXT_FILES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'text_files')
+
+
+@pytest.mark.parametrize('name', ['sacct.json', 'sacct_alloc.json'])
+def test_backends_build_the_same_jobs(name):
+    with open(os.path.join(TEXT_FILES, name), 'rb') as f:
+        assert parity_errors(f.read()) == []
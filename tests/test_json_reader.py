@@ -0,0 +1,20 @@
+import io
+import json
+
+import pytest
+
+from SacctJson import SacctJsonReader
+
+DOCUMENTS = ['{"jobs":[1.5,2e10,3]}',
+             '{"meta": 12345.678e-2, "jobs": [{"job_id": 1}, -0.25E+3], "errors": [7]}',
+             '{"jobs": []}',
+             '{"meta": {"command": ["sacct"]}, "jobs": [true, null, "x"]}']
+
+
+@pytest.mark.parametrize('document', DOCUMENTS)
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 1 << 20])
+def test_values_split_across_chunks(document, chunk_size):
+    expected = json.loads(document)
+    reader = SacctJsonReader(io.StringIO(document), chunk_size=chunk_size)
+    assert list(reader.job_dicts()) == expected.pop('jobs')
+    assert reader.members == expected
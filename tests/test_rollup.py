@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from SacctRollup import group_key
+from SacctSketch import KLLSketch, SketchRollup
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_group_key_rejects_unknown_columns():
+    with pytest.raises(ValueError, match="cannot group by 'Nope'"):
+        group_key(['Nope'])
+    # a column named by the header is accepted
+    assert group_key(['Partition'], extra_fields=('Partition',))
+
+
+def test_unknown_group_by_fails_on_empty_input():
+    result = subprocess.run([sys.executable, 'parse_sacct.py', '--group-by', 'Nope'],
+                            input='', capture_output=True, text=True, cwd=REPO)
+    assert result.returncode == 1
+    assert "cannot group by 'Nope'" in result.stderr
+    assert result.stdout == ''
+
+
+def test_sketches_of_different_sizes_do_not_merge():
+    small, large = KLLSketch(k=50), KLLSketch(k=200)
+    small.add(1.0)
+    with pytest.raises(ValueError, match='k=50'):
+        large.merge(small)
+    with pytest.raises(ValueError):
+        SketchRollup(['User'], k=200).merge(SketchRollup(['User'], k=50))
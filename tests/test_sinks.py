@@ -0,0 +1,25 @@
+import sqlite3
+
+from SacctSinks import SEFF_TSV_COLUMNS, SQLiteSink
+
+
+def _row(job_id, wait_time):
+    row = dict.fromkeys(SEFF_TSV_COLUMNS, '')
+    row.update(JobID=job_id, NNodes=1, AllocCPUS=4, wait_time=wait_time, timespan=wait_time)
+    return [row[column] for column in SEFF_TSV_COLUMNS]
+
+
+def test_sqlite_stores_missing_numbers_as_null(tmp_path):
+    path = str(tmp_path / 'jobs.db')
+    sink = SQLiteSink(path)
+    sink.start()
+    sink.write(_row('1', 60))
+    # a pending job has no wait time
+    sink.write(_row('2', ''))
+    sink.close()
+
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT JobID, typeof(wait_time), typeof(timespan) FROM jobs ORDER BY JobID").fetchall() == \
+        [('1', 'integer', 'integer'), ('2', 'null', 'null')]
+    assert conn.execute("SELECT max(wait_time) FROM jobs").fetchone() == (60,)
+    assert conn.execute("SELECT count(*) FROM jobs WHERE wait_time > 1e8").fetchone() == (0,)